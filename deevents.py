@@ -3,8 +3,462 @@ import os
 import re
 import json
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
 from collections import defaultdict
 from datetime import datetime, UTC
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+
+# Sessione HTTP condivisa da tutte le fasi: keep-alive, pool di connessioni per host e header comuni
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36",
+    "Accept-Language": "it-IT,it;q=0.9,en-US;q=0.8,en;q=0.7"
+}
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            # Un pool per host, grande abbastanza per i thread della ricerca loghi
+            adapter = HTTPAdapter(pool_connections=20, pool_maxsize=max(10, get_logo_workers() * 2))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HTTP_HEADERS)
+            _http_session = session
+    return _http_session
+
+def http_get(url, **kwargs):
+    """
+    Esegue una GET tramite la sessione condivisa, con timeout predefinito (HTTP_TIMEOUT nel file .env)
+    """
+    kwargs.setdefault("timeout", get_env_numero("HTTP_TIMEOUT", 30))
+    return get_http_session().get(url, **kwargs)
+
+# Scrittura incrementale di file XMLTV: ogni record viene scritto subito sul file, con escaping XML dei testi
+def xmltv_inizio(f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n')
+
+def xmltv_canale(f, channel_id, display_name):
+    f.write(f'  <channel id={quoteattr(str(channel_id))}>\n'
+            f'    <display-name>{escape(display_name)}</display-name>\n'
+            f'  </channel>\n')
+
+def xmltv_programma(f, start, stop, channel_id, titolo, descrizione, categoria, lang="it"):
+    f.write(f'  <programme start="{start}" stop="{stop}" channel={quoteattr(str(channel_id))}>\n'
+            f'    <title lang="{lang}">{escape(titolo)}</title>\n'
+            f'    <desc lang="{lang}">{escape(descrizione)}</desc>\n'
+            f'    <category lang="{lang}">{escape(categoria)}</category>\n'
+            f'  </programme>\n')
+
+def xmltv_fine(f):
+    f.write("</tv>\n")
+
+# Modello normalizzato del palinsesto daddylive: date e orari vengono convertiti una sola volta
+# per ogni stringa distinta e condivisi tra generatori M3U ed EPG degli eventi
+@lru_cache(maxsize=None)
+def parse_data_palinsesto(date_key):
+    """
+    Converte una chiave come "Saturday 24th May 2025 - Schedule Time UK GMT" in una data (None se non valida)
+    """
+    date_part = date_key.split(" - ")[0]
+    try:
+        return datetime.strptime(re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_part), "%A %d %B %Y").date()
+    except ValueError:
+        pass
+    try:
+        from dateutil import parser
+        return parser.parse(date_part, fuzzy=True).date()
+    except Exception as e:
+        print(f"[!] Errore parsing data '{date_part}': {e}")
+        return None
+
+@lru_cache(maxsize=None)
+def parse_orario_palinsesto(data, time_str):
+    """
+    Restituisce il datetime UTC dell'evento (None se l'orario non è nel formato HH:MM)
+    """
+    try:
+        return datetime.combine(data, datetime.strptime(time_str, "%H:%M").time())
+    except (ValueError, TypeError):
+        return None
+
+# Indice del palinsesto costruito una sola volta per esecuzione e condiviso da tutti i generatori di eventi
+# (chiave: percorso e data di modifica del file, così un nuovo scraping invalida l'indice)
+_indici_palinsesto = {}
+
+def parole_canale(channel_name):
+    return re.findall(r'\b\w+\b', re.sub(r'</?span.*?>', '', str(channel_name)).lower())
+
+def indice_palinsesto(path):
+    """
+    Decodifica il JSON una sola volta: eventi in ordine (con data, categoria e inizio_utc già convertiti),
+    indici per data e per parola del nome canale (usata per i filtri per lingua) e ordine delle sezioni
+    """
+    chiave = (os.path.abspath(path), os.path.getmtime(path))
+    if chiave in _indici_palinsesto:
+        return _indici_palinsesto[chiave]
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    eventi = []
+    per_data = defaultdict(list)
+    per_parola = defaultdict(list)
+    parole_canali = {}
+    sezioni = []
+
+    for date_key, sections in data.items():
+        data_evento = parse_data_palinsesto(date_key)
+        for category_raw, event_items in sections.items():
+            # Ordine delle sezioni (anche vuote), per riprodurre l'ordine dei gruppi nelle playlist
+            sezioni.append((data_evento, category_raw))
+            for item in event_items:
+                if not isinstance(item, dict):
+                    print(f"[!] Formato evento non valido nel palinsesto: {item}")
+                    continue
+                inizio_utc = parse_orario_palinsesto(data_evento, item.get("time", "00:00")) if data_evento else None
+                i_evento = len(eventi)
+                eventi.append({**item, "data_key": date_key, "data": data_evento, "categoria": category_raw, "inizio_utc": inizio_utc})
+                per_data[data_evento].append(i_evento)
+
+                for i_canale, ch in enumerate(item.get("channels", [])):
+                    parole = parole_canale(ch.get("channel_name", ""))
+                    parole_canali[(i_evento, i_canale)] = parole
+                    for posizione, parola in enumerate(parole):
+                        per_parola[parola].append((i_evento, i_canale, posizione))
+
+    indice = {
+        "eventi": eventi,
+        "per_data": per_data,
+        "per_parola": per_parola,
+        "parole_canali": parole_canali,
+        "sezioni": sezioni,
+    }
+    _indici_palinsesto.clear()
+    _indici_palinsesto[chiave] = indice
+    print(f"[INFO] Palinsesto indicizzato: {len(eventi)} eventi, {len(parole_canali)} canali evento")
+    return indice
+
+def eventi_per_parole(path, parole, date=None):
+    """
+    Restituisce [(evento, canali)] in ordine di palinsesto, con i soli canali il cui nome contiene
+    una delle parole chiave (anche composte, es. "tennis channel"); date limita le date considerate
+    """
+    indice = indice_palinsesto(path)
+    # Eventi ammessi dal filtro per data, ricavati dall'indice per data
+    ammessi = None if date is None else {i for d in date for i in indice["per_data"].get(d, ())}
+
+    trovati = defaultdict(set)
+    for parola in parole:
+        termini = parola.lower().split()
+        for i_evento, i_canale, posizione in indice["per_parola"].get(termini[0], ()):
+            if ammessi is not None and i_evento not in ammessi:
+                continue
+            if len(termini) > 1 and indice["parole_canali"][(i_evento, i_canale)][posizione:posizione + len(termini)] != termini:
+                continue
+            trovati[i_evento].add(i_canale)
+
+    risultato = []
+    for i_evento in sorted(trovati):
+        evento = indice["eventi"][i_evento]
+        canali = evento.get("channels", [])
+        risultato.append((evento, [canali[i] for i in sorted(trovati[i_evento])]))
+    return risultato
+
+# Cartella della cache HTTP locale (HTTP_CACHE_DIR nel file .env)
+def get_http_cache_dir():
+    cartella = os.getenv("HTTP_CACHE_DIR", "").strip() or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache")
+    os.makedirs(cartella, exist_ok=True)
+    return cartella
+
+# Mirror daddylive: scelta del dominio più veloce tra LINK_DADDY e LINK_DADDY_MIRRORS, valida per tutto il run
+_link_daddy = None
+
+def get_link_daddy():
+    """
+    Sonda in parallelo LINK_DADDY e i mirror di LINK_DADDY_MIRRORS con una GET leggera (solo header)
+    e restituisce il più veloce che risponde; la scelta resta in cache per LINK_DADDY_CACHE_MINUTI
+    """
+    global _link_daddy
+    if _link_daddy:
+        return _link_daddy
+
+    predefinito = os.getenv("LINK_DADDY", "https://daddylive.dad").strip().rstrip("/")
+    mirrors = [predefinito]
+    for mirror in os.getenv("LINK_DADDY_MIRRORS", "").split(","):
+        mirror = mirror.strip().rstrip("/")
+        if mirror and mirror not in mirrors:
+            mirrors.append(mirror)
+
+    if len(mirrors) == 1:
+        _link_daddy = predefinito
+        return _link_daddy
+
+    cache_file = os.path.join(get_http_cache_dir(), "link_daddy.json")
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache["mirrors"] == mirrors and time.time() - cache["salvato"] < get_env_numero("LINK_DADDY_CACHE_MINUTI", 30) * 60:
+            _link_daddy = cache["link"]
+            print(f"[INFO] Mirror daddylive dalla cache: {_link_daddy}")
+            return _link_daddy
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    def sonda(mirror):
+        inizio = time.time()
+        try:
+            response = http_get(f"{mirror}/", timeout=get_env_numero("LINK_DADDY_TIMEOUT_SONDA", 5), stream=True)
+            response.close()
+        except requests.RequestException:
+            return None
+        return time.time() - inizio if response.status_code < 400 else None
+
+    with ThreadPoolExecutor(max_workers=len(mirrors)) as executor:
+        latenze = list(executor.map(sonda, mirrors))
+
+    for mirror, latenza in zip(mirrors, latenze):
+        print(f"[🔍] Mirror {mirror}: " + (f"{latenza * 1000:.0f} ms" if latenza is not None else "non raggiungibile"))
+
+    raggiungibili = [(latenza, mirror) for mirror, latenza in zip(mirrors, latenze) if latenza is not None]
+    if not raggiungibili:
+        print(f"[!] Nessun mirror daddylive raggiungibile, uso {predefinito}")
+        _link_daddy = predefinito
+        return _link_daddy
+
+    _link_daddy = min(raggiungibili)[1]
+    print(f"[✓] Mirror daddylive scelto: {_link_daddy}")
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump({"mirrors": mirrors, "link": _link_daddy, "salvato": time.time()}, f)
+    except OSError as e:
+        print(f"[!] Impossibile salvare la cache dei mirror: {e}")
+    return _link_daddy
+
+# Numero di ricerche loghi eseguite in parallelo (configurabile con LOGO_WORKERS nel file .env)
+def get_logo_workers():
+    try:
+        return max(1, int(os.getenv("LOGO_WORKERS", "8").strip()))
+    except ValueError:
+        return 8
+
+# Le immagini combinate in logos/ restano valide per 3 ore
+LOGHI_DURATA_SECONDI = 3 * 60 * 60
+
+def eta_file_logo(percorso):
+    # Età in secondi del file, None se non esiste (o è stato appena rimosso da un altro thread)
+    try:
+        return time.time() - os.path.getmtime(percorso)
+    except OSError:
+        return None
+
+def pulisci_loghi_obsoleti(logos_dir="logos"):
+    """
+    Rimuove da logos/ le immagini combinate più vecchie di 3 ore; va eseguita una sola volta
+    prima della ricerca parallela dei loghi
+    """
+    try:
+        logo_files = os.listdir(logos_dir)
+    except OSError:
+        return
+    for logo_file in logo_files:
+        logo_path = os.path.join(logos_dir, logo_file)
+        file_age = eta_file_logo(logo_path)
+        if file_age is not None and file_age > LOGHI_DURATA_SECONDI and os.path.isfile(logo_path):
+            try:
+                os.remove(logo_path)
+                print(f"[🗑️] Rimosso logo obsoleto: {logo_path}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[!] Errore nella rimozione del logo {logo_path}: {e}")
+
+def risolvi_loghi_eventi(titoli, cerca_logo):
+    """
+    Risolve i loghi dei titoli indicati con un pool di thread limitato.
+    Restituisce un dizionario titolo -> URL del logo (None se non trovato)
+    """
+    titoli_unici = list(dict.fromkeys(titoli))
+    if not titoli_unici:
+        return {}
+
+    # Pulizia di logos/ una sola volta, prima che i thread inizino a leggere e creare immagini
+    pulisci_loghi_obsoleti()
+
+    def cerca_logo_sicuro(titolo):
+        print(f"[🔍] Ricerca logo per: {titolo}")
+        try:
+            return cerca_logo(titolo)
+        except Exception as e:
+            print(f"[!] Errore nella ricerca del logo per '{titolo}': {e}")
+            return None
+
+    workers = min(get_logo_workers(), len(titoli_unici))
+    print(f"[🔍] Ricerca loghi per {len(titoli_unici)} eventi con {workers} thread...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        loghi = list(executor.map(cerca_logo_sicuro, titoli_unici))
+
+    return dict(zip(titoli_unici, loghi))
+
+# Cache persistente dei loghi trovati, salvata nella cartella della cache HTTP (fuori dal repository,
+# conservata tra un run e l'altro da actions/cache)
+LOGO_CACHE_NOME = "cache_loghi.db"
+
+def get_logo_cache_file():
+    return os.path.join(get_http_cache_dir(), LOGO_CACHE_NOME)
+
+_logo_cache_lock = threading.Lock()
+_logo_cache_conn = None
+_logo_cache_stats = {"hit": 0, "miss": 0, "hit_negativi": 0, "errori": 0}
+
+def get_logo_cache():
+    global _logo_cache_conn
+    if _logo_cache_conn is None:
+        conn = sqlite3.connect(get_logo_cache_file(), check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS loghi (chiave TEXT PRIMARY KEY, url TEXT, aggiornato REAL NOT NULL)")
+        conn.commit()
+        _logo_cache_conn = conn
+    return _logo_cache_conn
+
+def get_env_numero(nome, default):
+    try:
+        return float(os.getenv(nome, str(default)).strip())
+    except ValueError:
+        return default
+
+def normalizza_chiave_logo(nome):
+    # "  Inter " e "inter" devono condividere la stessa voce in cache
+    return re.sub(r"\s+", " ", nome).strip().lower()
+
+def logo_locale_valido(url):
+    # Le immagini combinate in logos/ vengono eliminate dopo 3 ore: verifica che esistano ancora
+    match = re.search(r'(?:^|/main/)(logos/.+)$', url)
+    return not match or os.path.exists(match.group(1))
+
+def get_ttl_cache_loghi():
+    # Le ricerche senza risultato (url NULL) scadono prima di quelle andate a buon fine
+    ttl_secondi = get_env_numero("LOGO_CACHE_TTL_ORE", 168) * 3600
+    ttl_negativo_secondi = get_env_numero("LOGO_CACHE_TTL_NEGATIVO_ORE", 12) * 3600
+    return ttl_secondi, ttl_negativo_secondi
+
+def leggi_cache_logo(chiave):
+    """
+    Restituisce (trovato, url) per la chiave indicata, ignorando le voci scadute.
+    Un risultato (True, None) indica una ricerca già fallita di recente
+    """
+    ttl_secondi, ttl_negativo_secondi = get_ttl_cache_loghi()
+    with _logo_cache_lock:
+        row = get_logo_cache().execute("SELECT url, aggiornato FROM loghi WHERE chiave = ?", (chiave,)).fetchone()
+    if row is None:
+        return False, None
+    url, aggiornato = row
+    if time.time() - aggiornato > (ttl_secondi if url else ttl_negativo_secondi):
+        return False, None
+    return True, url
+
+def salva_cache_logo(chiave, url):
+    with _logo_cache_lock:
+        conn = get_logo_cache()
+        conn.execute("INSERT OR REPLACE INTO loghi (chiave, url, aggiornato) VALUES (?, ?, ?)", (chiave, url, time.time()))
+        conn.commit()
+
+def chiudi_cache_loghi():
+    """
+    Elimina le voci scadute, mantiene solo le LOGO_CACHE_MAX più recenti e chiude il database
+    """
+    global _logo_cache_conn
+    if _logo_cache_conn is None:
+        return
+    ttl_secondi, ttl_negativo_secondi = get_ttl_cache_loghi()
+    max_voci = int(get_env_numero("LOGO_CACHE_MAX", 5000))
+    with _logo_cache_lock:
+        conn = _logo_cache_conn
+        conn.execute("DELETE FROM loghi WHERE url IS NOT NULL AND aggiornato < ?", (time.time() - ttl_secondi,))
+        conn.execute("DELETE FROM loghi WHERE url IS NULL AND aggiornato < ?", (time.time() - ttl_negativo_secondi,))
+        conn.execute("DELETE FROM loghi WHERE chiave NOT IN (SELECT chiave FROM loghi ORDER BY aggiornato DESC LIMIT ?)", (max_voci,))
+        conn.commit()
+        conn.close()
+        _logo_cache_conn = None
+
+class RicercaLogoNonRiuscita(Exception):
+    """Errore di rete o risposta non 200 di Bing: la ricerca va ripetuta, non salvata in cache come 'nessun logo'"""
+
+class LogoProvvisorio(str):
+    """URL di ripiego valido per questo run ma da non salvare in cache (es. immagine combinata non creata)"""
+
+def con_cache_logo(tipo, cerca_logo):
+    """
+    Avvolge una funzione di ricerca logo con la cache persistente
+    """
+    def cerca_logo_con_cache(nome):
+        chiave = f"{tipo}:{normalizza_chiave_logo(nome)}"
+        trovato, url = leggi_cache_logo(chiave)
+        if trovato and url is None:
+            conta_statistica_cache_loghi("hit_negativi")
+            print(f"[✓] Nessun logo per '{nome}' (ricerca fallita di recente, salto)")
+            return None
+        if trovato and logo_locale_valido(url):
+            conta_statistica_cache_loghi("hit")
+            print(f"[✓] Logo in cache per '{nome}': {url}")
+            return url
+        conta_statistica_cache_loghi("miss")
+        try:
+            url = cerca_logo(nome)
+        except RicercaLogoNonRiuscita as e:
+            # Throttling o errore di rete: nessuna voce in cache, la ricerca verrà ripetuta al prossimo run
+            conta_statistica_cache_loghi("errori")
+            print(f"[!] Ricerca logo per '{nome}' non riuscita ({e}), non salvata in cache")
+            raise
+        if isinstance(url, LogoProvvisorio):
+            return str(url)
+        salva_cache_logo(chiave, url)
+        return url
+    return cerca_logo_con_cache
+
+def conta_statistica_cache_loghi(tipo):
+    with _logo_cache_lock:
+        _logo_cache_stats[tipo] += 1
+
+def stampa_statistiche_cache_loghi():
+    with _logo_cache_lock:
+        stats = dict(_logo_cache_stats)
+        for tipo in _logo_cache_stats:
+            _logo_cache_stats[tipo] = 0
+    print(f"[INFO] Cache loghi: {stats['hit']} hit, {stats['miss']} miss, {stats['hit_negativi']} hit negativi, {stats['errori']} ricerche non riuscite (non salvate)")
+
+# Profili lingua per le playlist eventi: parole chiave cercate nei nomi dei canali e file generati
+# (selezionabili con EVENTI_LINGUE nel file .env, es. "de,es,fr")
+PROFILI_LINGUA = {
+    "it": {"keywords": {"italy", "rai", "italia", "it"}},
+    "world": {"keywords": {"italy", "rai", "italia", "it", "uk", "tnt", "usa", "tennis channel", "tennis stream", "la"}},
+    "de": {"keywords": {"de"}},
+    "en": {"keywords": {"uk", "usa"}},
+    "es": {"keywords": {"spain", "es"}},
+    "fr": {"keywords": {"france"}},
+    "pt": {"keywords": {"portugal"}},
+}
+
+def get_profili_lingua():
+    """
+    Restituisce [(codice, profilo)] per le lingue richieste, con i nomi dei file m3u/xml di ciascun profilo
+    """
+    profili = []
+    for codice in os.getenv("EVENTI_LINGUE", "de").split(","):
+        codice = codice.strip().lower()
+        if not codice:
+            continue
+        if codice not in PROFILI_LINGUA:
+            print(f"[!] Profilo lingua sconosciuto: '{codice}' (disponibili: {', '.join(PROFILI_LINGUA)})")
+            continue
+        profili.append((codice, {**PROFILI_LINGUA[codice], "m3u": f"{codice}events.m3u", "xml": f"{codice}events.xml"}))
+    return profili
 
 def eventi_m3u8_generator():
     # Codice del terzo script qui
@@ -15,21 +469,18 @@ def eventi_m3u8_generator():
     import re 
     import requests 
     from datetime import datetime, timedelta 
-    from dateutil import parser 
     import urllib.parse 
     import os
     from dotenv import load_dotenv
     from PIL import Image, ImageDraw, ImageFont
     import io
-    import time
 
     # Carica le variabili d'ambiente dal file .env
     load_dotenv()
 
     PROXY = os.getenv("PROXYIP", "").strip()  
     JSON_FILE = "daddyliveSchedule.json" 
-    OUTPUT_FILE = "deevents.m3u" 
-    LINK_DADDY = os.getenv("LINK_DADDY", "https://daddylive.dad").strip()
+    LINK_DADDY = get_link_daddy()
 
     # Funzione per pulire il nome della categoria
     def clean_category_name(name): 
@@ -65,42 +516,36 @@ def eventi_m3u8_generator():
                 team1 = teams[0].strip()
                 team2 = teams[1].strip()
 
+                # Una ricerca di squadra non riuscita non blocca l'altra, ma rende il risultato provvisorio
+                errore_squadre = None
                 print(f"[🔍] Ricerca logo per Team 1: {team1}")
-                logo1_url = search_team_logo(team1)
+                try:
+                    logo1_url = search_team_logo(team1)
+                except RicercaLogoNonRiuscita as e:
+                    logo1_url, errore_squadre = None, e
 
                 print(f"[🔍] Ricerca logo per Team 2: {team2}")
-                logo2_url = search_team_logo(team2)
+                try:
+                    logo2_url = search_team_logo(team2)
+                except RicercaLogoNonRiuscita as e:
+                    logo2_url, errore_squadre = None, e
 
                 # Se abbiamo trovato entrambi i loghi, creiamo un'immagine combinata
                 if logo1_url and logo2_url:
                     # Scarica i loghi e l'immagine VS
                     try:
-                        from os.path import exists, getmtime
+                        from os.path import exists
 
                         # Crea la cartella logos se non esiste
                         logos_dir = "logos"
                         os.makedirs(logos_dir, exist_ok=True)
 
-                        # Controlla e rimuovi i loghi più vecchi di 3 ore
-                        current_time = time.time()
-                        three_hours_in_seconds = 3 * 60 * 60
-
-                        for logo_file in os.listdir(logos_dir):
-                            logo_path = os.path.join(logos_dir, logo_file)
-                            if os.path.isfile(logo_path):
-                                file_age = current_time - os.path.getmtime(logo_path)
-                                if file_age > three_hours_in_seconds:
-                                    try:
-                                        os.remove(logo_path)
-                                        print(f"[🗑️] Rimosso logo obsoleto: {logo_path}")
-                                    except Exception as e:
-                                        print(f"[!] Errore nella rimozione del logo {logo_path}: {e}")
-
                         # Verifica se l'immagine combinata esiste già e non è obsoleta
                         output_filename = f"logos/{team1}_vs_{team2}.png"
-                        if exists(output_filename):
-                            file_age = current_time - os.path.getmtime(output_filename)
-                            if file_age <= three_hours_in_seconds:
+                        # (i loghi obsoleti sono già stati rimossi da pulisci_loghi_obsoleti prima della ricerca)
+                        file_age = eta_file_logo(output_filename)
+                        if file_age is not None:
+                            if file_age <= LOGHI_DURATA_SECONDI:
                                 print(f"[✓] Utilizzo immagine combinata esistente: {output_filename}")
 
                                 # Carica le variabili d'ambiente per GitHub
@@ -117,10 +562,10 @@ def eventi_m3u8_generator():
                                     return output_filename
 
                         # Scarica i loghi
-                        response1 = requests.get(logo1_url, timeout=10)
+                        response1 = http_get(logo1_url, timeout=10)
                         img1 = Image.open(io.BytesIO(response1.content))
 
-                        response2 = requests.get(logo2_url, timeout=10)
+                        response2 = http_get(logo2_url, timeout=10)
                         img2 = Image.open(io.BytesIO(response2.content))
 
                         # Carica l'immagine VS (assicurati che esista nella directory corrente)
@@ -195,10 +640,15 @@ def eventi_m3u8_generator():
 
                     except Exception as e:
                         print(f"[!] Errore nella creazione dell'immagine combinata: {e}")
-                        # Se fallisce, restituisci solo il primo logo trovato
-                        return logo1_url
+                        # Se fallisce, restituisci solo il primo logo trovato (senza salvarlo in cache)
+                        return LogoProvvisorio(logo1_url)
 
                 # Se non abbiamo trovato entrambi i loghi, restituisci quello che abbiamo
+                if errore_squadre:
+                    # Risultato parziale dovuto a una ricerca non riuscita: usalo solo per questo run
+                    if logo1_url or logo2_url:
+                        return LogoProvvisorio(logo1_url or logo2_url)
+                    raise errore_squadre
                 return logo1_url or logo2_url
 
             if ':' in event_name:
@@ -220,7 +670,7 @@ def eventi_m3u8_generator():
                     "Connection": "keep-alive"
                 } 
 
-                response = requests.get(search_url, headers=headers, timeout=10)
+                response = http_get(search_url, headers=headers, timeout=10)
 
                 if response.status_code == 200: 
                     # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -243,6 +693,8 @@ def eventi_m3u8_generator():
                             # Se non troviamo PNG o SVG, prendi il primo risultato
                             print(f"[✓] Logo trovato con prefisso: {matches[0]}")
                             return matches[0]
+                else:
+                    raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
 
             # Se non riusciamo a identificare le squadre e il prefisso non ha dato risultati, procedi con la ricerca normale
             print(f"[🔍] Ricerca standard per: {clean_event_name}")
@@ -262,7 +714,7 @@ def eventi_m3u8_generator():
                 "Connection": "keep-alive"
             } 
 
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = http_get(search_url, headers=headers, timeout=10)
 
             if response.status_code == 200: 
                 # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -308,9 +760,14 @@ def eventi_m3u8_generator():
                 any_img = re.search(r'(https?://[^"\']+\.(?:png|jpg|jpeg|svg|webp))', response.text)
                 if any_img:
                     return any_img.group(1)
+            else:
+                raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
 
+        except RicercaLogoNonRiuscita:
+            raise
         except Exception as e: 
             print(f"[!] Errore nella ricerca del logo per '{event_name}': {e}") 
+            raise RicercaLogoNonRiuscita(str(e)) from e
 
         # Se non troviamo nulla, restituiamo None 
         return None
@@ -334,7 +791,7 @@ def eventi_m3u8_generator():
                 "Connection": "keep-alive"
             } 
 
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = http_get(search_url, headers=headers, timeout=10)
 
             if response.status_code == 200: 
                 # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -380,76 +837,85 @@ def eventi_m3u8_generator():
                 any_img = re.search(r'(https?://[^"\']+\.(?:png|jpg|jpeg|svg|webp))', response.text)
                 if any_img:
                     return any_img.group(1)
+            else:
+                raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
 
+        except RicercaLogoNonRiuscita:
+            raise
         except Exception as e: 
             print(f"[!] Errore nella ricerca del logo per '{team_name}': {e}") 
+            raise RicercaLogoNonRiuscita(str(e)) from e
 
         # Se non troviamo nulla, restituiamo None 
         return None
 
-    def extract_channels_from_json(path): 
-        keywords = {"de"} 
-        now = datetime.now() 
+    # Usa la cache persistente per non ripetere su Bing le ricerche già fatte nei run precedenti
+    search_team_logo = con_cache_logo("squadra", search_team_logo)
+    search_logo_for_event = con_cache_logo("evento", search_logo_for_event)
 
-        with open(path, "r", encoding="utf-8") as f: 
-            data = json.load(f) 
+    def extract_channels_from_json(path, keywords):
+        now = datetime.now()
 
-        categorized_channels = {} 
+        date_selezionate = {now.date()}
 
-        for date_key, sections in data.items(): 
-            date_part = date_key.split(" - ")[0] 
-            try: 
-                date_obj = parser.parse(date_part, fuzzy=True).date() 
-            except Exception as e: 
-                print(f"[!] Errore parsing data '{date_part}': {e}") 
-                continue 
+        # Gruppi creati nell'ordine delle sezioni del palinsesto per le date selezionate (come nella lettura diretta del JSON)
+        categorized_channels = {}
+        for data_sezione, category_raw in indice_palinsesto(path)["sezioni"]:
+            if data_sezione in date_selezionate:
+                categorized_channels.setdefault(clean_category_name(category_raw), [])
 
-            if date_obj != now.date(): 
-                continue 
+        # Interroga l'indice condiviso del palinsesto: solo eventi di oggi con canali che corrispondono alle parole chiave
+        for evento, canali in eventi_per_parole(path, keywords, date=date_selezionate):
+            date_obj = evento["data"]
 
-            date_str = date_obj.strftime("%Y-%m-%d") 
+            category = clean_category_name(evento["categoria"])
+            if category not in categorized_channels:
+                categorized_channels[category] = []
 
-            for category_raw, event_items in sections.items(): 
-                category = clean_category_name(category_raw) 
-                if category not in categorized_channels: 
-                    categorized_channels[category] = [] 
+            time_str = evento.get("time", "00:00")
+            if evento["inizio_utc"] is not None:
+                time_obj = evento["inizio_utc"] + timedelta(hours=2)
+                event_datetime = datetime.combine(date_obj, time_obj.time())
 
-                for item in event_items: 
-                    time_str = item.get("time", "00:00") 
-                    try: 
-                        time_obj = datetime.strptime(time_str, "%H:%M") + timedelta(hours=2) 
-                        event_datetime = datetime.combine(date_obj, time_obj.time()) 
+                if now - event_datetime > timedelta(hours=2):
+                    continue
 
-                        if now - event_datetime > timedelta(hours=2): 
-                            continue 
+                time_formatted = time_obj.strftime("%H:%M")
+            else:
+                time_formatted = time_str
 
-                        time_formatted = time_obj.strftime("%H:%M") 
-                    except Exception: 
-                        time_formatted = time_str 
+            event_title = evento.get("event", "Evento")
 
-                    event_title = item.get("event", "Evento") 
+            for ch in canali:
+                channel_name = ch.get("channel_name", "")
+                channel_id = ch.get("channel_id", "")
 
-                    for ch in item.get("channels", []): 
-                        channel_name = ch.get("channel_name", "") 
-                        channel_id = ch.get("channel_id", "") 
+                tvg_name = f"{event_title} ({time_formatted})"
+                categorized_channels[category].append({
+                    "tvg_name": tvg_name,
+                    "channel_name": channel_name,
+                    "channel_id": channel_id,
+                    "event_title": event_title  # Aggiungiamo il titolo dell'evento per la ricerca del logo
+                })
 
-                        words = set(re.findall(r'\b\w+\b', channel_name.lower())) 
-                        if keywords.intersection(words): 
-                            tvg_name = f"{event_title} ({time_formatted})" 
-                            categorized_channels[category].append({ 
-                                "tvg_name": tvg_name, 
-                                "channel_name": channel_name, 
-                                "channel_id": channel_id, 
-                                "event_title": event_title  # Aggiungiamo il titolo dell'evento per la ricerca del logo 
-                            }) 
+        return categorized_channels
 
-        return categorized_channels 
+    def generate_m3u_from_schedule(json_file, profili): 
+        # Un solo passaggio sull'indice del palinsesto per tutti i profili lingua
+        canali_per_profilo = {codice: extract_channels_from_json(json_file, profilo["keywords"]) for codice, profilo in profili}
 
-    def generate_m3u_from_schedule(json_file, output_file): 
-        categorized_channels = extract_channels_from_json(json_file) 
+        # Risolvi in parallelo i loghi di tutti gli eventi (di tutte le lingue) prima di scrivere le playlist
+        titoli_eventi = [re.sub(r'\s*\(\d{1,2}:\d{2}\)\s*$', '', ch["event_title"]) for categorized_channels in canali_per_profilo.values() for channels in categorized_channels.values() for ch in channels]
+        loghi_eventi = risolvi_loghi_eventi(titoli_eventi, search_logo_for_event)
+        chiudi_cache_loghi()
 
-        with open(output_file, "w", encoding="utf-8") as f: 
-            f.write('#EXTM3U x-tvg-url="https://raw.githubusercontent.com/realbestia/itatv/refs/heads/main/deevents.xml"\n') 
+        for codice, profilo in profili:
+            scrivi_m3u_profilo(canali_per_profilo[codice], profilo, loghi_eventi)
+            print(f"[✓] Playlist eventi '{codice}' salvata in {profilo['m3u']}")
+
+    def scrivi_m3u_profilo(categorized_channels, profilo, loghi_eventi):
+        with open(profilo["m3u"], "w", encoding="utf-8") as f: 
+            f.write(f'#EXTM3U x-tvg-url="https://raw.githubusercontent.com/realbestia/itatv/refs/heads/main/{profilo["xml"]}"\n') 
 
             for category, channels in categorized_channels.items(): 
                 if not channels: 
@@ -465,8 +931,7 @@ def eventi_m3u8_generator():
                     # Cerca un logo per questo evento
                     # Rimuovi l'orario dal titolo dell'evento prima di cercare il logo
                     clean_event_title = re.sub(r'\s*\(\d{1,2}:\d{2}\)\s*$', '', event_title)
-                    print(f"[🔍] Ricerca logo per: {clean_event_title}") 
-                    logo_url = search_logo_for_event(clean_event_title) 
+                    logo_url = loghi_eventi.get(clean_event_title) 
                     logo_attribute = f' tvg-logo="{logo_url}"' if logo_url else '' 
 
                     stream_url = (f"{PROXY}/proxy/m3u?url={LINK_DADDY}/embed/stream-{channel_id}.php")                    
@@ -481,7 +946,8 @@ def eventi_m3u8_generator():
             print("[!] Il modulo 'requests' non è installato. Installalo con 'pip install requests'") 
             exit(1) 
 
-        generate_m3u_from_schedule(JSON_FILE, OUTPUT_FILE) 
+        generate_m3u_from_schedule(JSON_FILE, get_profili_lingua()) 
+        stampa_statistiche_cache_loghi()
 
 def epg_eventi_generator():
     # Codice del quinto script qui
@@ -490,7 +956,6 @@ def epg_eventi_generator():
     # Il codice che avevi nello script "epg_eventi_generator.py" va qui, senza modifiche.
     import os
     import re
-    import json
     from datetime import datetime, timedelta
 
     # Funzione di utilità per pulire il testo (rimuovere tag HTML span)
@@ -498,46 +963,23 @@ def epg_eventi_generator():
         return re.sub(r'</?span.*?>', '', str(text))
 
     # --- SCRIPT 5: epg_eventi_xml_generator (genera eventi.xml) ---
-    def load_json_for_epg(json_file_path):
+    def load_json_for_epg(json_file_path, keywords):
         if not os.path.exists(json_file_path):
             print(f"[!] File JSON non trovato per EPG: {json_file_path}")
             return {}
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            json_data = json.load(file)
-        
+        # Interroga l'indice condiviso del palinsesto con le parole chiave dei canali da includere
         filtered_data = {}
-        for date, categories in json_data.items():
-            filtered_categories = {}
-            for category, events in categories.items():
-                filtered_events = []
-                for event_info in events:
-                    filtered_channels = []
-                    # Utilizza .get("channels", []) per gestire casi in cui "channels" potrebbe mancare
-                    for channel in event_info.get("channels", []): 
-                        channel_name = clean_text(channel.get("channel_name", "")) # Usa .get per sicurezza
-                        # Filtra per canali italiani
-                        if re.search(r'\b(de)\b', channel_name, re.IGNORECASE):
-                            filtered_channels.append(channel)
-                    if filtered_channels:
-                        # Assicura che event_info sia un dizionario prima dello unpacking
-                        if isinstance(event_info, dict):
-                            filtered_events.append({**event_info, "channels": filtered_channels})
-                        else:
-                            # Logga un avviso se il formato dell'evento non è quello atteso
-                            print(f"[!] Formato evento non valido durante il filtraggio per EPG: {event_info}")
-                if filtered_events:
-                    filtered_categories[category] = filtered_events
-            if filtered_categories:
-                filtered_data[date] = filtered_categories
+        for evento, canali in eventi_per_parole(json_file_path, keywords):
+            filtered_data.setdefault(evento["data_key"], {}).setdefault(evento["categoria"], []).append({**evento, "channels": canali})
         return filtered_data
 
-    def generate_epg_xml(json_data):
-        epg_content = '<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n'
+    def generate_epg_xml(json_data, output_file):
+        xmltv_inizio(output_file)
         
         italian_offset = timedelta(hours=2)
         italian_offset_str = "+0200" 
 
-        current_datetime_utc = datetime.now(UTC)
+        current_datetime_utc = datetime.now(UTC).replace(tzinfo=None)
         current_datetime_local = current_datetime_utc + italian_offset
 
         # Tiene traccia degli ID dei canali per cui è già stato scritto il tag <channel>
@@ -548,12 +990,8 @@ def epg_eventi_generator():
             # Viene resettato per ogni nuova data.
             last_event_end_time_per_channel_on_date = {}
 
-            try:
-                date_str_from_key = date_key.split(' - ')[0]
-                date_str_cleaned = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_str_from_key)
-                event_date_part = datetime.strptime(date_str_cleaned, "%A %d %B %Y").date()
-            except ValueError as e:
-                print(f"[!] Errore nel parsing della data EPG: '{date_str_from_key}'. Errore: {e}")
+            event_date_part = parse_data_palinsesto(date_key)
+            if event_date_part is None:
                 continue
 
             if event_date_part < current_datetime_local.date():
@@ -561,27 +999,22 @@ def epg_eventi_generator():
 
             for category_name, events_list in categories.items():
                 # Ordina gli eventi per orario di inizio (UTC) per garantire la corretta logica "evento precedente"
-                try:
-                    sorted_events_list = sorted(
-                        events_list,
-                        key=lambda x: datetime.strptime(x.get("time", "00:00"), "%H:%M").time()
-                    )
-                except Exception as e_sort:
-                    print(f"[!] Attenzione: Impossibile ordinare gli eventi per la categoria '{category_name}' nella data '{date_key}'. Si procede senza ordinamento. Errore: {e_sort}")
-                    sorted_events_list = events_list
+                # (gli orari non validi finiscono in testa e vengono scartati nel ciclo)
+                sorted_events_list = sorted(
+                    events_list,
+                    key=lambda x: (x["inizio_utc"] is not None, x["inizio_utc"] or datetime.min)
+                )
 
                 for event_info in sorted_events_list:
                     time_str_utc = event_info.get("time", "00:00")
                     event_name = clean_text(event_info.get("event", "Evento Sconosciuto"))
                     event_desc = event_info.get("description", f"{event_name} trasmesso in diretta.")
 
-                    try:
-                        event_time_utc_obj = datetime.strptime(time_str_utc, "%H:%M").time()
-                        event_datetime_utc = datetime.combine(event_date_part, event_time_utc_obj)
-                        event_datetime_local = event_datetime_utc + italian_offset
-                    except ValueError as e:
-                        print(f"[!] Errore parsing orario UTC '{time_str_utc}' per EPG evento '{event_name}'. Errore: {e}")
+                    event_datetime_utc = event_info["inizio_utc"]
+                    if event_datetime_utc is None:
+                        print(f"[!] Errore parsing orario UTC '{time_str_utc}' per EPG evento '{event_name}'.")
                         continue
+                    event_datetime_local = event_datetime_utc + italian_offset
                     
                     if event_datetime_local < (current_datetime_local - timedelta(hours=2)):
                         continue
@@ -594,9 +1027,7 @@ def epg_eventi_generator():
                             continue
 
                         if channel_id not in channel_ids_processed_for_channel_tag:
-                            epg_content += f'  <channel id="{channel_id}">\n'
-                            epg_content += f'    <display-name>{channel_name_cleaned}</display-name>\n'
-                            epg_content += f'  </channel>\n'
+                            xmltv_canale(output_file, channel_id, channel_name_cleaned)
                             channel_ids_processed_for_channel_tag.add(channel_id)
                         
                         # --- LOGICA ANNUNCIO MODIFICATA ---
@@ -623,11 +1054,12 @@ def epg_eventi_generator():
                         if announcement_start_local < announcement_stop_local:
                             announcement_title = f'Inizierà alle {event_datetime_local.strftime("%H:%M")}.' # Orario italiano
                             
-                            epg_content += f'  <programme start="{announcement_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" stop="{announcement_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" channel="{channel_id}">\n'
-                            epg_content += f'    <title lang="it">{announcement_title}</title>\n'
-                            epg_content += f'    <desc lang="it">{event_name}.</desc>\n' 
-                            epg_content += f'    <category lang="it">Annuncio</category>\n'
-                            epg_content += f'  </programme>\n'
+                            xmltv_programma(
+                                output_file,
+                                f'{announcement_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                                f'{announcement_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                                channel_id, announcement_title, f"{event_name}.", "Annuncio"
+                            )
                         elif announcement_start_local == announcement_stop_local:
                             print(f"[INFO] Annuncio di durata zero saltato per l'evento '{event_name}' sul canale '{channel_id}'.")
                         else: # announcement_start_local > announcement_stop_local
@@ -637,41 +1069,41 @@ def epg_eventi_generator():
                         main_event_start_local = event_datetime_local
                         main_event_stop_local = event_datetime_local + timedelta(hours=2) # Durata fissa 2 ore
                         
-                        epg_content += f'  <programme start="{main_event_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" stop="{main_event_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" channel="{channel_id}">\n'
-                        epg_content += f'    <title lang="it">{event_name}</title>\n'
-                        epg_content += f'    <desc lang="it">{event_desc}</desc>\n'
-                        epg_content += f'    <category lang="it">{clean_text(category_name)}</category>\n'
-                        epg_content += f'  </programme>\n'
+                        xmltv_programma(
+                            output_file,
+                            f'{main_event_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                            f'{main_event_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                            channel_id, event_name, event_desc, clean_text(category_name)
+                        )
 
                         # Aggiorna l'orario di fine dell'ultimo evento per questo canale in questa data
                         last_event_end_time_per_channel_on_date[channel_id] = main_event_stop_local
         
-        epg_content += "</tv>\n"
-        return epg_content
+        xmltv_fine(output_file)
 
     def epg_eventi_xml_generator():
-        print("Eseguendo la generazione di eventi.xml...")
+        print("Eseguendo la generazione degli EPG eventi per lingua...")
         JSON_INPUT_FILE_EPG = "daddyliveSchedule.json" # File JSON di input
-        XML_OUTPUT_FILE_EPG = "deevents.xml"          # File XML di output
         
         # Determina il percorso assoluto dei file basandosi sulla directory dello script
         script_dir = os.path.dirname(os.path.abspath(__file__))
         json_input_full_path = os.path.join(script_dir, JSON_INPUT_FILE_EPG)
-        xml_output_full_path = os.path.join(script_dir, XML_OUTPUT_FILE_EPG)
 
-        # Carica i dati JSON filtrati per i canali italiani
-        json_data_for_epg = load_json_for_epg(json_input_full_path)
-        if not json_data_for_epg: # Se non ci sono dati (es. file non trovato o vuoto dopo il filtro)
-            print(f"[!] Nessun dato JSON caricato o filtrato da {json_input_full_path}. Salto la generazione di {XML_OUTPUT_FILE_EPG}.")
-            return # Esce dalla funzione se non ci sono dati
+        for codice, profilo in get_profili_lingua():
+            XML_OUTPUT_FILE_EPG = profilo["xml"]          # File XML di output del profilo
+            xml_output_full_path = os.path.join(script_dir, XML_OUTPUT_FILE_EPG)
 
-        # Genera il contenuto XML dell'EPG
-        epg_content_xml = generate_epg_xml(json_data_for_epg)
-        
-        # Salva il contenuto XML nel file di output
-        with open(xml_output_full_path, "w", encoding="utf-8") as file:
-            file.write(epg_content_xml)
-        print(f"File EPG deevents.xml salvato in: {xml_output_full_path}")
+            # Carica i dati JSON filtrati per i canali della lingua del profilo
+            json_data_for_epg = load_json_for_epg(json_input_full_path, profilo["keywords"])
+            if not json_data_for_epg: # Se non ci sono dati (es. file non trovato o vuoto dopo il filtro)
+                print(f"[!] Nessun dato JSON caricato o filtrato da {json_input_full_path}. Salto la generazione di {XML_OUTPUT_FILE_EPG}.")
+                continue
+
+            # Genera l'EPG scrivendo i record direttamente nel file di output
+            with open(xml_output_full_path + ".tmp", "w", encoding="utf-8") as file:
+                generate_epg_xml(json_data_for_epg, file)
+            os.replace(xml_output_full_path + ".tmp", xml_output_full_path)
+            print(f"File EPG {XML_OUTPUT_FILE_EPG} salvato in: {xml_output_full_path}")
 
     if __name__ == "__main__":
         epg_eventi_xml_generator()
@@ -3,8 +3,531 @@ import os
 import re
 import json
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
 from collections import defaultdict
 from datetime import datetime, timedelta
+import gzip
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+
+# Sessione HTTP condivisa da tutte le fasi: keep-alive, pool di connessioni per host e header comuni
+HTTP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36",
+    "Accept-Language": "it-IT,it;q=0.9,en-US;q=0.8,en;q=0.7"
+}
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            # Un pool per host, grande abbastanza per i thread della ricerca loghi
+            adapter = HTTPAdapter(pool_connections=20, pool_maxsize=max(10, get_logo_workers() * 2))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(HTTP_HEADERS)
+            _http_session = session
+    return _http_session
+
+def http_get(url, **kwargs):
+    """
+    Esegue una GET tramite la sessione condivisa, con timeout predefinito (HTTP_TIMEOUT nel file .env)
+    """
+    kwargs.setdefault("timeout", get_env_numero("HTTP_TIMEOUT", 30))
+    return get_http_session().get(url, **kwargs)
+
+# Cache HTTP locale (ETag / Last-Modified) per le sorgenti EPG e playlist che cambiano raramente
+def get_http_cache_dir():
+    cartella = os.getenv("HTTP_CACHE_DIR", "").strip() or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".http_cache")
+    os.makedirs(cartella, exist_ok=True)
+    return cartella
+
+def http_get_cached(url):
+    """
+    Scarica url inviando If-None-Match / If-Modified-Since se è già in cache.
+    Restituisce il percorso del file locale con il contenuto aggiornato
+    """
+    base = os.path.join(get_http_cache_dir(), hashlib.sha256(url.encode("utf-8")).hexdigest()[:32])
+    percorso_body = base + ".body"
+    percorso_meta = base + ".json"
+
+    meta = {}
+    if os.path.exists(percorso_body) and os.path.exists(percorso_meta):
+        try:
+            with open(percorso_meta, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    with http_get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304 and meta:
+            print(f"[✓] {url} non modificato, uso la copia in cache")
+            return percorso_body
+        response.raise_for_status()
+
+        percorso_tmp = percorso_body + ".tmp"
+        with open(percorso_tmp, "wb") as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                f.write(chunk)
+        os.replace(percorso_tmp, percorso_body)
+
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+    with open(percorso_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return percorso_body
+
+# Catalogo dei canali vavoo condiviso tra canali italiani e world: scaricato e decodificato una sola volta per run
+_catalogo_canali = {}
+_catalogo_canali_lock = threading.Lock()
+
+def get_catalogo_canali(base_url):
+    """
+    Restituisce la lista di base_url/channels, scaricandola solo alla prima richiesta
+    """
+    with _catalogo_canali_lock:
+        if base_url not in _catalogo_canali:
+            try:
+                response = http_get(f"{base_url}/channels", timeout=10)
+                response.raise_for_status()
+                _catalogo_canali[base_url] = response.json()
+            except requests.RequestException as e:
+                print(f"Errore durante il download da {base_url}: {e}")
+                return []
+        else:
+            print(f"[✓] Catalogo canali di {base_url} già scaricato, lo riutilizzo")
+        return _catalogo_canali[base_url]
+
+@contextmanager
+def apri_output_epg(percorso):
+    """
+    Apre in scrittura un file EPG e la sua copia compressa percorso.gz: ogni blocco viene scritto
+    in entrambi i file durante lo streaming. I file finali vengono sostituiti solo a scrittura completata
+    """
+    percorso_gz = percorso + ".gz"
+    with open(percorso + ".tmp", "wb") as f_xml, open(percorso_gz + ".tmp", "wb") as f_raw:
+        # mtime=0: a parità di contenuto il file .gz resta identico e non genera commit inutili
+        with gzip.GzipFile(filename=os.path.basename(percorso), mode="wb", fileobj=f_raw, mtime=0) as f_gz:
+            def scrivi(blocco):
+                f_xml.write(blocco)
+                f_gz.write(blocco)
+            yield scrivi
+    os.replace(percorso + ".tmp", percorso)
+    os.replace(percorso_gz + ".tmp", percorso_gz)
+
+# Scrittura incrementale di file XMLTV: ogni record viene scritto subito sul file, con escaping XML dei testi
+def xmltv_inizio(f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n')
+
+def xmltv_canale(f, channel_id, display_name):
+    f.write(f'  <channel id={quoteattr(str(channel_id))}>\n'
+            f'    <display-name>{escape(display_name)}</display-name>\n'
+            f'  </channel>\n')
+
+def xmltv_programma(f, start, stop, channel_id, titolo, descrizione, categoria, lang="it"):
+    f.write(f'  <programme start="{start}" stop="{stop}" channel={quoteattr(str(channel_id))}>\n'
+            f'    <title lang="{lang}">{escape(titolo)}</title>\n'
+            f'    <desc lang="{lang}">{escape(descrizione)}</desc>\n'
+            f'    <category lang="{lang}">{escape(categoria)}</category>\n'
+            f'  </programme>\n')
+
+def xmltv_fine(f):
+    f.write("</tv>\n")
+
+# Modello normalizzato del palinsesto daddylive: date e orari vengono convertiti una sola volta
+# per ogni stringa distinta e condivisi tra generatori M3U ed EPG degli eventi
+@lru_cache(maxsize=None)
+def parse_data_palinsesto(date_key):
+    """
+    Converte una chiave come "Saturday 24th May 2025 - Schedule Time UK GMT" in una data (None se non valida)
+    """
+    date_part = date_key.split(" - ")[0]
+    try:
+        return datetime.strptime(re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_part), "%A %d %B %Y").date()
+    except ValueError:
+        pass
+    try:
+        from dateutil import parser
+        return parser.parse(date_part, fuzzy=True).date()
+    except Exception as e:
+        print(f"[!] Errore parsing data '{date_part}': {e}")
+        return None
+
+@lru_cache(maxsize=None)
+def parse_orario_palinsesto(data, time_str):
+    """
+    Restituisce il datetime UTC dell'evento (None se l'orario non è nel formato HH:MM)
+    """
+    try:
+        return datetime.combine(data, datetime.strptime(time_str, "%H:%M").time())
+    except (ValueError, TypeError):
+        return None
+
+# Indice del palinsesto costruito una sola volta per esecuzione e condiviso da tutti i generatori di eventi
+# (chiave: percorso e data di modifica del file, così un nuovo scraping invalida l'indice)
+_indici_palinsesto = {}
+
+def parole_canale(channel_name):
+    return re.findall(r'\b\w+\b', re.sub(r'</?span.*?>', '', str(channel_name)).lower())
+
+def indice_palinsesto(path):
+    """
+    Decodifica il JSON una sola volta: eventi in ordine (con data, categoria e inizio_utc già convertiti),
+    indici per data e per parola del nome canale (usata per i filtri per lingua) e ordine delle sezioni
+    """
+    chiave = (os.path.abspath(path), os.path.getmtime(path))
+    if chiave in _indici_palinsesto:
+        return _indici_palinsesto[chiave]
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    eventi = []
+    per_data = defaultdict(list)
+    per_parola = defaultdict(list)
+    parole_canali = {}
+    sezioni = []
+
+    for date_key, sections in data.items():
+        data_evento = parse_data_palinsesto(date_key)
+        for category_raw, event_items in sections.items():
+            # Ordine delle sezioni (anche vuote), per riprodurre l'ordine dei gruppi nelle playlist
+            sezioni.append((data_evento, category_raw))
+            for item in event_items:
+                if not isinstance(item, dict):
+                    print(f"[!] Formato evento non valido nel palinsesto: {item}")
+                    continue
+                inizio_utc = parse_orario_palinsesto(data_evento, item.get("time", "00:00")) if data_evento else None
+                i_evento = len(eventi)
+                eventi.append({**item, "data_key": date_key, "data": data_evento, "categoria": category_raw, "inizio_utc": inizio_utc})
+                per_data[data_evento].append(i_evento)
+
+                for i_canale, ch in enumerate(item.get("channels", [])):
+                    parole = parole_canale(ch.get("channel_name", ""))
+                    parole_canali[(i_evento, i_canale)] = parole
+                    for posizione, parola in enumerate(parole):
+                        per_parola[parola].append((i_evento, i_canale, posizione))
+
+    indice = {
+        "eventi": eventi,
+        "per_data": per_data,
+        "per_parola": per_parola,
+        "parole_canali": parole_canali,
+        "sezioni": sezioni,
+    }
+    _indici_palinsesto.clear()
+    _indici_palinsesto[chiave] = indice
+    print(f"[INFO] Palinsesto indicizzato: {len(eventi)} eventi, {len(parole_canali)} canali evento")
+    return indice
+
+def eventi_per_parole(path, parole, date=None):
+    """
+    Restituisce [(evento, canali)] in ordine di palinsesto, con i soli canali il cui nome contiene
+    una delle parole chiave (anche composte, es. "tennis channel"); date limita le date considerate
+    """
+    indice = indice_palinsesto(path)
+    # Eventi ammessi dal filtro per data, ricavati dall'indice per data
+    ammessi = None if date is None else {i for d in date for i in indice["per_data"].get(d, ())}
+
+    trovati = defaultdict(set)
+    for parola in parole:
+        termini = parola.lower().split()
+        for i_evento, i_canale, posizione in indice["per_parola"].get(termini[0], ()):
+            if ammessi is not None and i_evento not in ammessi:
+                continue
+            if len(termini) > 1 and indice["parole_canali"][(i_evento, i_canale)][posizione:posizione + len(termini)] != termini:
+                continue
+            trovati[i_evento].add(i_canale)
+
+    risultato = []
+    for i_evento in sorted(trovati):
+        evento = indice["eventi"][i_evento]
+        canali = evento.get("channels", [])
+        risultato.append((evento, [canali[i] for i in sorted(trovati[i_evento])]))
+    return risultato
+
+# Mirror daddylive: scelta del dominio più veloce tra LINK_DADDY e LINK_DADDY_MIRRORS, valida per tutto il run
+_link_daddy = None
+
+def get_link_daddy():
+    """
+    Sonda in parallelo LINK_DADDY e i mirror di LINK_DADDY_MIRRORS con una GET leggera (solo header)
+    e restituisce il più veloce che risponde; la scelta resta in cache per LINK_DADDY_CACHE_MINUTI
+    """
+    global _link_daddy
+    if _link_daddy:
+        return _link_daddy
+
+    predefinito = os.getenv("LINK_DADDY", "https://daddylive.dad").strip().rstrip("/")
+    mirrors = [predefinito]
+    for mirror in os.getenv("LINK_DADDY_MIRRORS", "").split(","):
+        mirror = mirror.strip().rstrip("/")
+        if mirror and mirror not in mirrors:
+            mirrors.append(mirror)
+
+    if len(mirrors) == 1:
+        _link_daddy = predefinito
+        return _link_daddy
+
+    cache_file = os.path.join(get_http_cache_dir(), "link_daddy.json")
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache["mirrors"] == mirrors and time.time() - cache["salvato"] < get_env_numero("LINK_DADDY_CACHE_MINUTI", 30) * 60:
+            _link_daddy = cache["link"]
+            print(f"[INFO] Mirror daddylive dalla cache: {_link_daddy}")
+            return _link_daddy
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    def sonda(mirror):
+        inizio = time.time()
+        try:
+            response = http_get(f"{mirror}/", timeout=get_env_numero("LINK_DADDY_TIMEOUT_SONDA", 5), stream=True)
+            response.close()
+        except requests.RequestException:
+            return None
+        return time.time() - inizio if response.status_code < 400 else None
+
+    with ThreadPoolExecutor(max_workers=len(mirrors)) as executor:
+        latenze = list(executor.map(sonda, mirrors))
+
+    for mirror, latenza in zip(mirrors, latenze):
+        print(f"[🔍] Mirror {mirror}: " + (f"{latenza * 1000:.0f} ms" if latenza is not None else "non raggiungibile"))
+
+    raggiungibili = [(latenza, mirror) for mirror, latenza in zip(mirrors, latenze) if latenza is not None]
+    if not raggiungibili:
+        print(f"[!] Nessun mirror daddylive raggiungibile, uso {predefinito}")
+        _link_daddy = predefinito
+        return _link_daddy
+
+    _link_daddy = min(raggiungibili)[1]
+    print(f"[✓] Mirror daddylive scelto: {_link_daddy}")
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump({"mirrors": mirrors, "link": _link_daddy, "salvato": time.time()}, f)
+    except OSError as e:
+        print(f"[!] Impossibile salvare la cache dei mirror: {e}")
+    return _link_daddy
+
+# Numero di ricerche loghi eseguite in parallelo (configurabile con LOGO_WORKERS nel file .env)
+def get_logo_workers():
+    try:
+        return max(1, int(os.getenv("LOGO_WORKERS", "8").strip()))
+    except ValueError:
+        return 8
+
+# Le immagini combinate in logos/ restano valide per 3 ore
+LOGHI_DURATA_SECONDI = 3 * 60 * 60
+
+def eta_file_logo(percorso):
+    # Età in secondi del file, None se non esiste (o è stato appena rimosso da un altro thread)
+    try:
+        return time.time() - os.path.getmtime(percorso)
+    except OSError:
+        return None
+
+def pulisci_loghi_obsoleti(logos_dir="logos"):
+    """
+    Rimuove da logos/ le immagini combinate più vecchie di 3 ore; va eseguita una sola volta
+    prima della ricerca parallela dei loghi
+    """
+    try:
+        logo_files = os.listdir(logos_dir)
+    except OSError:
+        return
+    for logo_file in logo_files:
+        logo_path = os.path.join(logos_dir, logo_file)
+        file_age = eta_file_logo(logo_path)
+        if file_age is not None and file_age > LOGHI_DURATA_SECONDI and os.path.isfile(logo_path):
+            try:
+                os.remove(logo_path)
+                print(f"[🗑️] Rimosso logo obsoleto: {logo_path}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[!] Errore nella rimozione del logo {logo_path}: {e}")
+
+def risolvi_loghi_eventi(titoli, cerca_logo):
+    """
+    Risolve i loghi dei titoli indicati con un pool di thread limitato.
+    Restituisce un dizionario titolo -> URL del logo (None se non trovato)
+    """
+    titoli_unici = list(dict.fromkeys(titoli))
+    if not titoli_unici:
+        return {}
+
+    # Pulizia di logos/ una sola volta, prima che i thread inizino a leggere e creare immagini
+    pulisci_loghi_obsoleti()
+
+    def cerca_logo_sicuro(titolo):
+        print(f"[🔍] Ricerca logo per: {titolo}")
+        try:
+            return cerca_logo(titolo)
+        except Exception as e:
+            print(f"[!] Errore nella ricerca del logo per '{titolo}': {e}")
+            return None
+
+    workers = min(get_logo_workers(), len(titoli_unici))
+    print(f"[🔍] Ricerca loghi per {len(titoli_unici)} eventi con {workers} thread...")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        loghi = list(executor.map(cerca_logo_sicuro, titoli_unici))
+
+    return dict(zip(titoli_unici, loghi))
+
+# Cache persistente dei loghi trovati, salvata nella cartella della cache HTTP (fuori dal repository,
+# conservata tra un run e l'altro da actions/cache)
+LOGO_CACHE_NOME = "cache_loghi.db"
+
+def get_logo_cache_file():
+    return os.path.join(get_http_cache_dir(), LOGO_CACHE_NOME)
+
+_logo_cache_lock = threading.Lock()
+_logo_cache_conn = None
+_logo_cache_stats = {"hit": 0, "miss": 0, "hit_negativi": 0, "errori": 0}
+
+def get_logo_cache():
+    global _logo_cache_conn
+    if _logo_cache_conn is None:
+        conn = sqlite3.connect(get_logo_cache_file(), check_same_thread=False)
+        conn.execute("CREATE TABLE IF NOT EXISTS loghi (chiave TEXT PRIMARY KEY, url TEXT, aggiornato REAL NOT NULL)")
+        conn.commit()
+        _logo_cache_conn = conn
+    return _logo_cache_conn
+
+def get_env_numero(nome, default):
+    try:
+        return float(os.getenv(nome, str(default)).strip())
+    except ValueError:
+        return default
+
+def normalizza_chiave_logo(nome):
+    # "  Inter " e "inter" devono condividere la stessa voce in cache
+    return re.sub(r"\s+", " ", nome).strip().lower()
+
+def logo_locale_valido(url):
+    # Le immagini combinate in logos/ vengono eliminate dopo 3 ore: verifica che esistano ancora
+    match = re.search(r'(?:^|/main/)(logos/.+)$', url)
+    return not match or os.path.exists(match.group(1))
+
+def get_ttl_cache_loghi():
+    # Le ricerche senza risultato (url NULL) scadono prima di quelle andate a buon fine
+    ttl_secondi = get_env_numero("LOGO_CACHE_TTL_ORE", 168) * 3600
+    ttl_negativo_secondi = get_env_numero("LOGO_CACHE_TTL_NEGATIVO_ORE", 12) * 3600
+    return ttl_secondi, ttl_negativo_secondi
+
+def leggi_cache_logo(chiave):
+    """
+    Restituisce (trovato, url) per la chiave indicata, ignorando le voci scadute.
+    Un risultato (True, None) indica una ricerca già fallita di recente
+    """
+    ttl_secondi, ttl_negativo_secondi = get_ttl_cache_loghi()
+    with _logo_cache_lock:
+        row = get_logo_cache().execute("SELECT url, aggiornato FROM loghi WHERE chiave = ?", (chiave,)).fetchone()
+    if row is None:
+        return False, None
+    url, aggiornato = row
+    if time.time() - aggiornato > (ttl_secondi if url else ttl_negativo_secondi):
+        return False, None
+    return True, url
+
+def salva_cache_logo(chiave, url):
+    with _logo_cache_lock:
+        conn = get_logo_cache()
+        conn.execute("INSERT OR REPLACE INTO loghi (chiave, url, aggiornato) VALUES (?, ?, ?)", (chiave, url, time.time()))
+        conn.commit()
+
+def chiudi_cache_loghi():
+    """
+    Elimina le voci scadute, mantiene solo le LOGO_CACHE_MAX più recenti e chiude il database
+    """
+    global _logo_cache_conn
+    if _logo_cache_conn is None:
+        return
+    ttl_secondi, ttl_negativo_secondi = get_ttl_cache_loghi()
+    max_voci = int(get_env_numero("LOGO_CACHE_MAX", 5000))
+    with _logo_cache_lock:
+        conn = _logo_cache_conn
+        conn.execute("DELETE FROM loghi WHERE url IS NOT NULL AND aggiornato < ?", (time.time() - ttl_secondi,))
+        conn.execute("DELETE FROM loghi WHERE url IS NULL AND aggiornato < ?", (time.time() - ttl_negativo_secondi,))
+        conn.execute("DELETE FROM loghi WHERE chiave NOT IN (SELECT chiave FROM loghi ORDER BY aggiornato DESC LIMIT ?)", (max_voci,))
+        conn.commit()
+        conn.close()
+        _logo_cache_conn = None
+
+class RicercaLogoNonRiuscita(Exception):
+    """Errore di rete o risposta non 200 di Bing: la ricerca va ripetuta, non salvata in cache come 'nessun logo'"""
+
+class LogoProvvisorio(str):
+    """URL di ripiego valido per questo run ma da non salvare in cache (es. immagine combinata non creata)"""
+
+def con_cache_logo(tipo, cerca_logo):
+    """
+    Avvolge una funzione di ricerca logo con la cache persistente
+    """
+    def cerca_logo_con_cache(nome):
+        chiave = f"{tipo}:{normalizza_chiave_logo(nome)}"
+        trovato, url = leggi_cache_logo(chiave)
+        if trovato and url is None:
+            conta_statistica_cache_loghi("hit_negativi")
+            print(f"[✓] Nessun logo per '{nome}' (ricerca fallita di recente, salto)")
+            return None
+        if trovato and logo_locale_valido(url):
+            conta_statistica_cache_loghi("hit")
+            print(f"[✓] Logo in cache per '{nome}': {url}")
+            return url
+        conta_statistica_cache_loghi("miss")
+        try:
+            url = cerca_logo(nome)
+        except RicercaLogoNonRiuscita as e:
+            # Throttling o errore di rete: nessuna voce in cache, la ricerca verrà ripetuta al prossimo run
+            conta_statistica_cache_loghi("errori")
+            print(f"[!] Ricerca logo per '{nome}' non riuscita ({e}), non salvata in cache")
+            raise
+        if isinstance(url, LogoProvvisorio):
+            return str(url)
+        salva_cache_logo(chiave, url)
+        return url
+    return cerca_logo_con_cache
+
+def conta_statistica_cache_loghi(tipo):
+    with _logo_cache_lock:
+        _logo_cache_stats[tipo] += 1
+
+def stampa_statistiche_cache_loghi():
+    with _logo_cache_lock:
+        stats = dict(_logo_cache_stats)
+        for tipo in _logo_cache_stats:
+            _logo_cache_stats[tipo] = 0
+    print(f"[INFO] Cache loghi: {stats['hit']} hit, {stats['miss']} miss, {stats['hit_negativi']} hit negativi, {stats['errori']} ricerche non riuscite (non salvate)")
+
+# Profili lingua per le playlist eventi: parole chiave cercate nei nomi dei canali
+PROFILI_LINGUA = {
+    "it": {"keywords": {"italy", "rai", "italia", "it"}},
+    "world": {"keywords": {"italy", "rai", "italia", "it", "uk", "tnt", "usa", "tennis channel", "tennis stream", "la"}},
+    "de": {"keywords": {"de"}},
+    "en": {"keywords": {"uk", "usa"}},
+    "es": {"keywords": {"spain", "es"}},
+    "fr": {"keywords": {"france"}},
+    "pt": {"keywords": {"portugal"}},
+}
 
 def merger_playlistworld():
     # Codice del primo script qui
@@ -12,7 +535,6 @@ def merger_playlistworld():
     # Ad esempio:
     print("Eseguendo il merger_playlist.py...")
     # Il codice che avevi nello script "merger_playlist.py" va qui, senza modifiche.
-    import requests
     import os
     from dotenv import load_dotenv
 
@@ -21,6 +543,8 @@ def merger_playlistworld():
 
     NOMEREPO = os.getenv("NOMEREPO", "").strip()
     NOMEGITHUB = os.getenv("NOMEGITHUB", "").strip()
+    # Con EPG_GZ=si l'intestazione punta alla versione compressa dell'EPG
+    EPG_FILE = "epg.xml.gz" if os.getenv("EPG_GZ", "no").strip().lower() == "si" else "epg.xml"
     
     # Percorsi o URL delle playlist M3U8
     url1 = "channels_italy.m3u8"  # File locale
@@ -31,9 +555,8 @@ def merger_playlistworld():
     # Funzione per scaricare o leggere una playlist
     def download_playlist(source, append_params=False, exclude_group_title=None):
         if source.startswith("http"):
-            response = requests.get(source)
-            response.raise_for_status()
-            playlist = response.text
+            with open(http_get_cached(source), 'r', encoding='utf-8', errors='replace') as f:
+                playlist = f.read()
         else:
             with open(source, 'r', encoding='utf-8') as f:
                 playlist = f.read()
@@ -59,7 +582,7 @@ def merger_playlistworld():
     combined_playlist = playlist1 + "\n" + playlist2 + "\n" + playlist3 + "\n" + playlist4
     
     # Aggiungi intestazione EPG
-    combined_playlist = f'#EXTM3U x-tvg-url="https://raw.githubusercontent.com/{NOMEGITHUB}/{NOMEREPO}/refs/heads/main/epg.xml"\n' + combined_playlist
+    combined_playlist = f'#EXTM3U x-tvg-url="https://raw.githubusercontent.com/{NOMEGITHUB}/{NOMEREPO}/refs/heads/main/{EPG_FILE}"\n' + combined_playlist
     
     # Salva in .m3u
     output_m3u = os.path.join(script_directory, "combined_playlist.m3u")
@@ -80,7 +603,6 @@ def merger_playlist():
     # Ad esempio:
     print("Eseguendo il merger_playlist.py...")
     # Il codice che avevi nello script "merger_playlist.py" va qui, senza modifiche.
-    import requests
     import os
     from dotenv import load_dotenv
 
@@ -89,6 +611,8 @@ def merger_playlist():
 
     NOMEREPO = os.getenv("NOMEREPO", "").strip()
     NOMEGITHUB = os.getenv("NOMEGITHUB", "").strip()
+    # Con EPG_GZ=si l'intestazione punta alla versione compressa dell'EPG
+    EPG_FILE = "epg.xml.gz" if os.getenv("EPG_GZ", "no").strip().lower() == "si" else "epg.xml"
     
     # Percorsi o URL delle playlist M3U8
     url1 = "channels_italy.m3u8"  # File locale
@@ -98,9 +622,8 @@ def merger_playlist():
     # Funzione per scaricare o leggere una playlist
     def download_playlist(source, append_params=False, exclude_group_title=None):
         if source.startswith("http"):
-            response = requests.get(source)
-            response.raise_for_status()
-            playlist = response.text
+            with open(http_get_cached(source), 'r', encoding='utf-8', errors='replace') as f:
+                playlist = f.read()
         else:
             with open(source, 'r', encoding='utf-8') as f:
                 playlist = f.read()
@@ -125,7 +648,7 @@ def merger_playlist():
     combined_playlist = playlist1 + "\n" + playlist2 + "\n" + playlist3 
     
     # Aggiungi intestazione EPG
-    combined_playlist = f'#EXTM3U x-tvg-url="https://raw.githubusercontent.com/{NOMEGITHUB}/{NOMEREPO}/refs/heads/main/epg.xml"\n' + combined_playlist
+    combined_playlist = f'#EXTM3U x-tvg-url="https://raw.githubusercontent.com/{NOMEGITHUB}/{NOMEREPO}/refs/heads/main/{EPG_FILE}"\n' + combined_playlist
     
     # Salva in .m3u
     output_m3u = os.path.join(script_directory, "combined_playlist.m3u")
@@ -148,8 +671,9 @@ def epg_merger():
     import requests
     import gzip
     import os
+    import calendar
     import xml.etree.ElementTree as ET
-    import io
+    from functools import lru_cache
 
     # URL dei file GZIP o XML da elaborare
     urls_gzip = [
@@ -168,79 +692,295 @@ def epg_merger():
     # File eventi locale
     path_eventi = 'eventi.xml'
 
-    def download_and_parse_xml(url):
-        """Scarica un file .xml o .gzip e restituisce l'ElementTree."""
+    def download_xml(url):
+        """Scarica un file .xml o .gzip nella cache locale e ne restituisce il percorso."""
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-
-            # Prova a decomprimere come GZIP
-            try:
-                with gzip.open(io.BytesIO(response.content), 'rb') as f_in:
-                    xml_content = f_in.read()
-            except (gzip.BadGzipFile, OSError):
-                # Non è un file gzip, usa direttamente il contenuto
-                xml_content = response.content
-
-            return ET.ElementTree(ET.fromstring(xml_content))
+            return http_get_cached(url)
         except requests.exceptions.RequestException as e:
             print(f"Errore durante il download da {url}: {e}")
-        except ET.ParseError as e:
-            print(f"Errore nel parsing del file XML da {url}: {e}")
+        except OSError as e:
+            print(f"Errore nella cache locale per {url}: {e}")
         return None
 
-    # Creare un unico XML vuoto
-    root_finale = ET.Element('tv')
-    tree_finale = ET.ElementTree(root_finale)
+    def apri_xml(percorso):
+        """Apre in lettura un file XML, decomprimendolo se è un GZIP."""
+        with open(percorso, 'rb') as f:
+            is_gzip = f.read(2) == b'\x1f\x8b'
+        return gzip.open(percorso, 'rb') if is_gzip else open(percorso, 'rb')
+
+    # Normalizzazione degli ID canale, memorizzata per ogni ID grezzo:
+    # le stesse poche centinaia di ID si ripetono in tutti i programmi
+    @lru_cache(maxsize=None)
+    def normalizza_id(valore):
+        return valore.replace(" ", "").lower()
+
+    # Funzione per pulire attributi
+    def clean_attribute(element, attr_name):
+        old_value = element.get(attr_name)
+        if old_value is not None:
+            element.set(attr_name, normalizza_id(old_value))
+
+    # Finestra temporale dei programmi da conservare (EPG_ORE_PASSATE / EPG_GIORNI_FUTURI nel file .env, vuoto = nessun limite)
+    ora_corrente = time.time()
+    ore_passate = os.getenv("EPG_ORE_PASSATE", "6").strip()
+    giorni_futuri = os.getenv("EPG_GIORNI_FUTURI", "3").strip()
+    # Un valore vuoto disattiva il limite; un valore non numerico usa il predefinito invece di interrompere il run
+    inizio_finestra = ora_corrente - get_env_numero("EPG_ORE_PASSATE", 6) * 3600 if ore_passate else None
+    fine_finestra = ora_corrente + get_env_numero("EPG_GIORNI_FUTURI", 3) * 86400 if giorni_futuri else None
+
+    @lru_cache(maxsize=None)
+    def orario_xmltv(valore):
+        """Converte un orario XMLTV (YYYYmmddHHMMSS +HHMM) in secondi epoch UTC, senza strptime."""
+        try:
+            secondi = calendar.timegm((int(valore[0:4]), int(valore[4:6]), int(valore[6:8]),
+                                       int(valore[8:10]), int(valore[10:12]), int(valore[12:14] or 0)))
+            offset = valore[14:].strip()
+            if offset:
+                segno = -1 if offset[0] == '-' else 1
+                secondi -= segno * (int(offset[1:3]) * 3600 + int(offset[3:5]) * 60)
+            return secondi
+        except (ValueError, TypeError):
+            return None
+
+    def fuori_finestra(start, stop):
+        if inizio_finestra is not None:
+            secondi_stop = orario_xmltv(stop)
+            if secondi_stop is not None and secondi_stop < inizio_finestra:
+                return True
+        if fine_finestra is not None:
+            secondi_start = orario_xmltv(start)
+            if secondi_start is not None and secondi_start > fine_finestra:
+                return True
+        return False
+
+    # Indici dei canali e dei programmi già scritti, per eliminare i duplicati tra le sorgenti
+    canali_scritti = set()
+    programmi_scritti = set()
+    duplicati = {'elementi': 0, 'byte': 0}
+    scartati = {'fuori_finestra': 0}
+
+    def emetti_elemento(scrivi, tag, canale, start, stop, contenuto):
+        """Applica finestra temporale e deduplicazione a un elemento già normalizzato e lo scrive."""
+        if tag == 'channel':
+            chiave, indice = canale, canali_scritti
+        elif tag == 'programme':
+            if fuori_finestra(start, stop):
+                scartati['fuori_finestra'] += 1
+                return
+            chiave, indice = (canale, start, stop), programmi_scritti
+        else:
+            scrivi(contenuto)
+            return
+
+        if chiave in indice:
+            duplicati['elementi'] += 1
+            duplicati['byte'] += len(contenuto)
+            return
+        indice.add(chiave)
+        scrivi(contenuto)
+
+    # Frammenti normalizzati di ogni sorgente: se il contenuto non cambia vengono
+    # ricopiati nell'output senza rifare il parsing XML
+    cartella_frammenti = os.path.join(get_http_cache_dir(), 'frammenti')
+    os.makedirs(cartella_frammenti, exist_ok=True)
+    versione_frammenti = '1'
+
+    def percorsi_frammento(nome):
+        base = os.path.join(cartella_frammenti, hashlib.sha256(nome.encode('utf-8')).hexdigest()[:32])
+        return base + '.frag', base + '.sha256'
+
+    def impronta_sorgente(percorso, solo_programmi):
+        impronta = hashlib.sha256(f"{versione_frammenti}:{solo_programmi}:".encode('utf-8'))
+        with open(percorso, 'rb') as f:
+            for blocco in iter(lambda: f.read(1 << 20), b''):
+                impronta.update(blocco)
+        return impronta.hexdigest()
+
+    def riusa_frammento(scrivi, nome, impronta):
+        """
+        Ricopia il frammento salvato della sorgente se l'impronta coincide.
+        Ogni elemento è preceduto da una riga JSON [tag, canale, start, stop, lunghezza].
+        """
+        percorso_frag, percorso_impronta = percorsi_frammento(nome)
+        try:
+            with open(percorso_impronta, 'r', encoding='utf-8') as f:
+                if f.read().strip() != impronta:
+                    return False
+            emetti_frammento(scrivi, percorso_frag)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def emetti_frammento(scrivi, percorso_frag):
+        with open(percorso_frag, 'rb') as f_frag:
+            while True:
+                intestazione = f_frag.readline()
+                if not intestazione:
+                    break
+                tag, canale, start, stop, lunghezza = json.loads(intestazione)
+                emetti_elemento(scrivi, tag, canale, start, stop, f_frag.read(lunghezza))
+
+    def scrivi_elemento(f_frag, element):
+        if element.tag == 'channel':
+            clean_attribute(element, 'id')
+            canale = element.get('id')
+        else:
+            clean_attribute(element, 'channel')
+            canale = element.get('channel')
+        start, stop = element.get('start'), element.get('stop')
+        element.tail = '\n'
+        contenuto = ET.tostring(element, encoding='utf-8')
+
+        f_frag.write(json.dumps([element.tag, canale, start, stop, len(contenuto)]).encode('utf-8') + b'\n')
+        f_frag.write(contenuto)
+
+    def copia_elementi(scrivi, percorso, nome, solo_programmi=False):
+        """
+        Legge il file con iterparse e salva ogni figlio di <tv> nel frammento appena è completo,
+        poi lo elimina dalla memoria. Con solo_programmi copia solo i <programme>.
+        Il frammento entra nell'output solo se la sorgente è stata letta per intero (una sorgente
+        con errori di parsing viene scartata del tutto); se la sorgente non è cambiata dall'ultimo
+        run viene riusato il frammento già normalizzato.
+        """
+        try:
+            impronta = impronta_sorgente(percorso, solo_programmi)
+        except OSError as e:
+            print(f"Errore nella lettura del file XML da {nome}: {e}")
+            return
 
-    # Processare ogni URL
-    for url in urls_gzip:
-        tree = download_and_parse_xml(url)
-        if tree is not None:
-            root = tree.getroot()
-            for element in root:
-                root_finale.append(element)
+        if riusa_frammento(scrivi, nome, impronta):
+            print(f"[✓] {nome} invariato, riutilizzo il frammento già elaborato")
+            return
 
-    # Aggiungere eventi.xml da file locale
-    if os.path.exists(path_eventi):
+        percorso_frag, percorso_impronta = percorsi_frammento(nome)
         try:
-            tree_eventi = ET.parse(path_eventi)
-            root_eventi = tree_eventi.getroot()
-            for programme in root_eventi.findall(".//programme"):
-                root_finale.append(programme)
+            with apri_xml(percorso) as f_in, open(percorso_frag + '.tmp', 'wb') as f_frag:
+                root = None
+                profondita = 0
+                for evento, element in ET.iterparse(f_in, events=('start', 'end')):
+                    if evento == 'start':
+                        if root is None:
+                            root = element
+                        profondita += 1
+                        continue
+
+                    profondita -= 1
+                    if solo_programmi:
+                        if element.tag == 'programme':
+                            scrivi_elemento(f_frag, element)
+                            element.clear()
+                    elif profondita == 1:
+                        scrivi_elemento(f_frag, element)
+
+                    # Elemento figlio di <tv> completato: libera la memoria
+                    if profondita == 1:
+                        root.clear()
+
+            # Il frammento viene registrato e copiato nell'output solo se la sorgente è stata letta per intero
+            os.replace(percorso_frag + '.tmp', percorso_frag)
+            with open(percorso_impronta, 'w', encoding='utf-8') as f:
+                f.write(impronta)
         except ET.ParseError as e:
-            print(f"Errore nel parsing del file eventi.xml: {e}")
-    else:
-        print(f"File non trovato: {path_eventi}")
-
-    # Aggiungere it.xml da URL remoto
-    tree_it = download_and_parse_xml(url_it)
-    if tree_it is not None:
-        root_it = tree_it.getroot()
-        for programme in root_it.findall(".//programme"):
-            root_finale.append(programme)
-    else:
-        print(f"Impossibile scaricare o analizzare il file it.xml da {url_it}")
+            print(f"Errore nel parsing del file XML da {nome}: {e}")
+            rimuovi_frammento_parziale(percorso_frag)
+            return
+        except OSError as e:
+            print(f"Errore nella lettura del file XML da {nome}: {e}")
+            rimuovi_frammento_parziale(percorso_frag)
+            return
 
-    # Funzione per pulire attributi
-    def clean_attribute(element, attr_name):
-        if attr_name in element.attrib:
-            old_value = element.attrib[attr_name]
-            new_value = old_value.replace(" ", "").lower()
-            element.attrib[attr_name] = new_value
+        try:
+            emetti_frammento(scrivi, percorso_frag)
+        except (OSError, ValueError) as e:
+            print(f"Errore nella lettura del frammento di {nome}: {e}")
 
-    # Pulire gli ID dei canali
-    for channel in root_finale.findall(".//channel"):
-        clean_attribute(channel, 'id')
+    def rimuovi_frammento_parziale(percorso_frag):
+        try:
+            os.remove(percorso_frag + '.tmp')
+        except FileNotFoundError:
+            pass
+
+    # Scaricare tutte le sorgenti remote in parallelo: executor.map mantiene l'ordine delle sorgenti
+    with ThreadPoolExecutor(max_workers=len(urls_gzip) + 1) as executor:
+        percorsi = list(executor.map(download_xml, urls_gzip + [url_it]))
+    percorsi_gzip, percorso_it = percorsi[:-1], percorsi[-1]
+
+    # Scrivere il file finale in streaming, una sorgente alla volta
+    with apri_output_epg(output_xml) as scrivi:
+        scrivi(b"<?xml version='1.0' encoding='utf-8'?>\n<tv>\n")
+
+        # Processare ogni URL
+        for url, percorso in zip(urls_gzip, percorsi_gzip):
+            if percorso is not None:
+                copia_elementi(scrivi, percorso, url)
+
+        # Aggiungere eventi.xml da file locale
+        if os.path.exists(path_eventi):
+            copia_elementi(scrivi, path_eventi, path_eventi, solo_programmi=True)
+        else:
+            print(f"File non trovato: {path_eventi}")
+
+        # Aggiungere it.xml da URL remoto
+        if percorso_it is not None:
+            copia_elementi(scrivi, percorso_it, url_it, solo_programmi=True)
+        else:
+            print(f"Impossibile scaricare o analizzare il file it.xml da {url_it}")
 
-    # Pulire gli attributi 'channel' nei programmi
-    for programme in root_finale.findall(".//programme"):
-        clean_attribute(programme, 'channel')
+        scrivi(b"</tv>\n")
 
     # Salvare il file XML finale
-    with open(output_xml, 'wb') as f_out:
-        tree_finale.write(f_out, encoding='utf-8', xml_declaration=True)
-    print(f"File XML salvato: {output_xml}")
+    print(f"File XML salvato: {output_xml} (e {output_xml}.gz)")
+    print(f"[INFO] Duplicati rimossi: {duplicati['elementi']} elementi ({duplicati['byte']} byte)")
+    print(f"[INFO] Programmi fuori dalla finestra temporale scartati: {scartati['fuori_finestra']}")
+
+# Funzione per ridurre epg.xml ai soli canali referenziati dalle playlist generate nello stesso run
+def epg_pruner():
+    print("Eseguendo l'epg_pruner...")
+    import os
+    import re
+    import xml.etree.ElementTree as ET
+
+    input_xml = 'epg.xml'
+    playlist = 'combined_playlist.m3u8'
+
+    if not os.path.exists(input_xml) or not os.path.exists(playlist):
+        print(f"File non trovato: {input_xml} o {playlist}. Salto la riduzione dell'EPG.")
+        return
+
+    # Raccogliere i tvg-id usati nella playlist combinata (canali italiani, eventi, Pluto)
+    with open(playlist, 'r', encoding='utf-8') as f:
+        tvg_ids = {tvg_id.replace(" ", "").lower() for tvg_id in re.findall(r'tvg-id="([^"]+)"', f.read())}
+
+    if not tvg_ids:
+        print(f"[!] Nessun tvg-id trovato in {playlist}. Salto la riduzione dell'EPG.")
+        return
+
+    conservati = 0
+    rimossi = 0
+    with apri_output_epg(input_xml) as scrivi, open(input_xml, 'rb') as f_in:
+        scrivi(b"<?xml version='1.0' encoding='utf-8'?>\n<tv>\n")
+        root = None
+        profondita = 0
+        for evento, element in ET.iterparse(f_in, events=('start', 'end')):
+            if evento == 'start':
+                if root is None:
+                    root = element
+                profondita += 1
+                continue
+
+            profondita -= 1
+            if profondita == 1:
+                id_canale = element.get('id') if element.tag == 'channel' else element.get('channel')
+                if id_canale in tvg_ids:
+                    element.tail = '\n'
+                    scrivi(ET.tostring(element, encoding='utf-8'))
+                    conservati += 1
+                else:
+                    rimossi += 1
+                root.clear()
+        scrivi(b"</tv>\n")
+
+    print(f"File XML ridotto ai canali referenziati: {conservati} elementi conservati, {rimossi} rimossi")
 
 # Funzione per il terzo script (eventi_m3u8_generator.py)
 def eventi_m3u8_generator():
@@ -252,13 +992,11 @@ def eventi_m3u8_generator():
     import re 
     import requests 
     from datetime import datetime, timedelta 
-    from dateutil import parser 
     import urllib.parse 
     import os
     from dotenv import load_dotenv
     from PIL import Image, ImageDraw, ImageFont
     import io
-    import time
 
     # Carica le variabili d'ambiente dal file .env
     load_dotenv()
@@ -267,7 +1005,7 @@ def eventi_m3u8_generator():
     MFP_PASSWORD = os.getenv("PASSMFP", "").strip()  # Inserisci la tua password API MFP 
     JSON_FILE = "daddyliveSchedule.json" 
     OUTPUT_FILE = "eventi.m3u8" 
-    LINK_DADDY = os.getenv("LINK_DADDY", "https://daddylive.dad").strip()
+    LINK_DADDY = get_link_daddy()
 
         # Funzione per pulire il nome della categoria
     def clean_category_name(name): 
@@ -303,17 +1041,25 @@ def eventi_m3u8_generator():
                 team1 = teams[0].strip()
                 team2 = teams[1].strip()
                 
+                # Una ricerca di squadra non riuscita non blocca l'altra, ma rende il risultato provvisorio
+                errore_squadre = None
                 print(f"[🔍] Ricerca logo per Team 1: {team1}")
-                logo1_url = search_team_logo(team1)
+                try:
+                    logo1_url = search_team_logo(team1)
+                except RicercaLogoNonRiuscita as e:
+                    logo1_url, errore_squadre = None, e
                 
                 print(f"[🔍] Ricerca logo per Team 2: {team2}")
-                logo2_url = search_team_logo(team2)
+                try:
+                    logo2_url = search_team_logo(team2)
+                except RicercaLogoNonRiuscita as e:
+                    logo2_url, errore_squadre = None, e
                 
                 # Se abbiamo trovato entrambi i loghi, creiamo un'immagine combinata
                 if logo1_url and logo2_url:
                     # Scarica i loghi e l'immagine VS
                     try:
-                        from os.path import exists, getmtime
+                        from os.path import exists
                         
                         # Crea la cartella logos se non esiste
                         logos_dir = "logos"
@@ -321,9 +1067,10 @@ def eventi_m3u8_generator():
                         
                         # Verifica se l'immagine combinata esiste già e non è obsoleta
                         output_filename = f"logos/{team1}_vs_{team2}.png"
-                        if exists(output_filename):
-                            file_age = current_time - os.path.getmtime(output_filename)
-                            if file_age <= three_hours_in_seconds:
+                        # (i loghi obsoleti sono già stati rimossi da pulisci_loghi_obsoleti prima della ricerca)
+                        file_age = eta_file_logo(output_filename)
+                        if file_age is not None:
+                            if file_age <= LOGHI_DURATA_SECONDI:
                                 print(f"[✓] Utilizzo immagine combinata esistente: {output_filename}")
                                 
                                 # Carica le variabili d'ambiente per GitHub
@@ -340,10 +1087,10 @@ def eventi_m3u8_generator():
                                     return output_filename
                         
                         # Scarica i loghi
-                        response1 = requests.get(logo1_url, timeout=10)
+                        response1 = http_get(logo1_url, timeout=10)
                         img1 = Image.open(io.BytesIO(response1.content))
                         
-                        response2 = requests.get(logo2_url, timeout=10)
+                        response2 = http_get(logo2_url, timeout=10)
                         img2 = Image.open(io.BytesIO(response2.content))
                         
                         # Carica l'immagine VS (assicurati che esista nella directory corrente)
@@ -418,10 +1165,15 @@ def eventi_m3u8_generator():
                         
                     except Exception as e:
                         print(f"[!] Errore nella creazione dell'immagine combinata: {e}")
-                        # Se fallisce, restituisci solo il primo logo trovato
-                        return logo1_url
+                        # Se fallisce, restituisci solo il primo logo trovato (senza salvarlo in cache)
+                        return LogoProvvisorio(logo1_url)
                 
                 # Se non abbiamo trovato entrambi i loghi, restituisci quello che abbiamo
+                if errore_squadre:
+                    # Risultato parziale dovuto a una ricerca non riuscita: usalo solo per questo run
+                    if logo1_url or logo2_url:
+                        return LogoProvvisorio(logo1_url or logo2_url)
+                    raise errore_squadre
                 return logo1_url or logo2_url
             if ':' in event_name:
                 # Usa la parte prima dei ":" per la ricerca
@@ -442,7 +1194,7 @@ def eventi_m3u8_generator():
                     "Connection": "keep-alive"
                 } 
                 
-                response = requests.get(search_url, headers=headers, timeout=10)
+                response = http_get(search_url, headers=headers, timeout=10)
                 
                 if response.status_code == 200: 
                     # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -465,6 +1217,8 @@ def eventi_m3u8_generator():
                             # Se non troviamo PNG o SVG, prendi il primo risultato
                             print(f"[✓] Logo trovato con prefisso: {matches[0]}")
                             return matches[0]
+                else:
+                    raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
             
             # Se non riusciamo a identificare le squadre e il prefisso non ha dato risultati, procedi con la ricerca normale
             print(f"[🔍] Ricerca standard per: {clean_event_name}")
@@ -485,7 +1239,7 @@ def eventi_m3u8_generator():
                 "Connection": "keep-alive"
             } 
             
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = http_get(search_url, headers=headers, timeout=10)
             
             if response.status_code == 200: 
                 # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -531,9 +1285,14 @@ def eventi_m3u8_generator():
                 any_img = re.search(r'(https?://[^"\']+\.(?:png|jpg|jpeg|svg|webp))', response.text)
                 if any_img:
                     return any_img.group(1)
+            else:
+                raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
                     
+        except RicercaLogoNonRiuscita:
+            raise
         except Exception as e: 
             print(f"[!] Errore nella ricerca del logo per '{event_name}': {e}") 
+            raise RicercaLogoNonRiuscita(str(e)) from e
         
         # Se non troviamo nulla, restituiamo None 
         return None
@@ -557,7 +1316,7 @@ def eventi_m3u8_generator():
                 "Connection": "keep-alive"
             } 
             
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = http_get(search_url, headers=headers, timeout=10)
             
             if response.status_code == 200: 
                 # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -603,73 +1362,77 @@ def eventi_m3u8_generator():
                 any_img = re.search(r'(https?://[^"\']+\.(?:png|jpg|jpeg|svg|webp))', response.text)
                 if any_img:
                     return any_img.group(1)
+            else:
+                raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
                     
+        except RicercaLogoNonRiuscita:
+            raise
         except Exception as e: 
             print(f"[!] Errore nella ricerca del logo per '{team_name}': {e}") 
+            raise RicercaLogoNonRiuscita(str(e)) from e
         
         # Se non troviamo nulla, restituiamo None 
         return None
      
-    def extract_channels_from_json(path): 
-        keywords = {"italy", "rai", "italia", "it"} 
-        now = datetime.now() 
-      
-        with open(path, "r", encoding="utf-8") as f: 
-            data = json.load(f) 
-      
-        categorized_channels = {} 
-      
-        for date_key, sections in data.items(): 
-            date_part = date_key.split(" - ")[0] 
-            try: 
-                date_obj = parser.parse(date_part, fuzzy=True).date() 
-            except Exception as e: 
-                print(f"[!] Errore parsing data '{date_part}': {e}") 
-                continue 
-      
-            if date_obj != now.date(): 
-                continue 
-      
-            date_str = date_obj.strftime("%Y-%m-%d") 
-      
-            for category_raw, event_items in sections.items(): 
-                category = clean_category_name(category_raw) 
-                if category not in categorized_channels: 
-                    categorized_channels[category] = [] 
-      
-                for item in event_items: 
-                    time_str = item.get("time", "00:00") 
-                    try: 
-                        time_obj = datetime.strptime(time_str, "%H:%M") + timedelta(hours=2) 
-                        event_datetime = datetime.combine(date_obj, time_obj.time()) 
-      
-                        if now - event_datetime > timedelta(hours=2): 
-                            continue 
-      
-                        time_formatted = time_obj.strftime("%H:%M") 
-                    except Exception: 
-                        time_formatted = time_str 
-      
-                    event_title = item.get("event", "Evento") 
-      
-                    for ch in item.get("channels", []): 
-                        channel_name = ch.get("channel_name", "") 
-                        channel_id = ch.get("channel_id", "") 
-      
-                        words = set(re.findall(r'\b\w+\b', channel_name.lower())) 
-                        if keywords.intersection(words): 
-                            tvg_name = f"{event_title} ({time_formatted})" 
-                            categorized_channels[category].append({ 
-                                "tvg_name": tvg_name, 
-                                "channel_name": channel_name, 
-                                "channel_id": channel_id, 
-                                "event_title": event_title  # Aggiungiamo il titolo dell'evento per la ricerca del logo 
-                            }) 
-      
-        return categorized_channels 
+    # Usa la cache persistente per non ripetere su Bing le ricerche già fatte nei run precedenti
+    search_team_logo = con_cache_logo("squadra", search_team_logo)
+    search_logo_for_event = con_cache_logo("evento", search_logo_for_event)
+
+    def extract_channels_from_json(path):
+        keywords = PROFILI_LINGUA["it"]["keywords"]
+        now = datetime.now()
+
+        date_selezionate = {now.date()}
+
+        # Gruppi creati nell'ordine delle sezioni del palinsesto per le date selezionate (come nella lettura diretta del JSON)
+        categorized_channels = {}
+        for data_sezione, category_raw in indice_palinsesto(path)["sezioni"]:
+            if data_sezione in date_selezionate:
+                categorized_channels.setdefault(clean_category_name(category_raw), [])
+
+        # Interroga l'indice condiviso del palinsesto: solo eventi di oggi con canali che corrispondono alle parole chiave
+        for evento, canali in eventi_per_parole(path, keywords, date=date_selezionate):
+            date_obj = evento["data"]
+
+            category = clean_category_name(evento["categoria"])
+            if category not in categorized_channels:
+                categorized_channels[category] = []
+
+            time_str = evento.get("time", "00:00")
+            if evento["inizio_utc"] is not None:
+                time_obj = evento["inizio_utc"] + timedelta(hours=2)
+                event_datetime = datetime.combine(date_obj, time_obj.time())
+
+                if now - event_datetime > timedelta(hours=2):
+                    continue
+
+                time_formatted = time_obj.strftime("%H:%M")
+            else:
+                time_formatted = time_str
+
+            event_title = evento.get("event", "Evento")
+
+            for ch in canali:
+                channel_name = ch.get("channel_name", "")
+                channel_id = ch.get("channel_id", "")
+
+                tvg_name = f"{event_title} ({time_formatted})"
+                categorized_channels[category].append({
+                    "tvg_name": tvg_name,
+                    "channel_name": channel_name,
+                    "channel_id": channel_id,
+                    "event_title": event_title  # Aggiungiamo il titolo dell'evento per la ricerca del logo
+                })
+
+        return categorized_channels
       
     def generate_m3u_from_schedule(json_file, output_file): 
         categorized_channels = extract_channels_from_json(json_file) 
+
+        # Risolvi in parallelo i loghi di tutti gli eventi prima di scrivere la playlist
+        titoli_eventi = [re.sub(r'\s*\(\d{1,2}:\d{2}\)\s*$', '', ch["event_title"]) for channels in categorized_channels.values() for ch in channels]
+        loghi_eventi = risolvi_loghi_eventi(titoli_eventi, search_logo_for_event)
+        chiudi_cache_loghi()
       
         with open(output_file, "w", encoding="utf-8") as f: 
             f.write("#EXTM3U\n") 
@@ -688,8 +1451,7 @@ def eventi_m3u8_generator():
                     # Cerca un logo per questo evento
                     # Rimuovi l'orario dal titolo dell'evento prima di cercare il logo
                     clean_event_title = re.sub(r'\s*\(\d{1,2}:\d{2}\)\s*$', '', event_title)
-                    print(f"[🔍] Ricerca logo per: {clean_event_title}") 
-                    logo_url = search_logo_for_event(clean_event_title) 
+                    logo_url = loghi_eventi.get(clean_event_title) 
                     logo_attribute = f' tvg-logo="{logo_url}"' if logo_url else '' 
       
                     stream_url = (f"{MFP_IP}/extractor/video?host=DLHD&d={LINK_DADDY}/embed/stream-{channel_id}.php" 
@@ -706,6 +1468,7 @@ def eventi_m3u8_generator():
             exit(1) 
              
         generate_m3u_from_schedule(JSON_FILE, OUTPUT_FILE) 
+        stampa_statistiche_cache_loghi()
 
 def eventi_m3u8_generator_world():
     # Codice del terzo script qui
@@ -716,13 +1479,11 @@ def eventi_m3u8_generator_world():
     import re 
     import requests 
     from datetime import datetime, timedelta 
-    from dateutil import parser 
     import urllib.parse 
     import os
     from dotenv import load_dotenv
     from PIL import Image, ImageDraw, ImageFont
     import io
-    import time
 
     # Carica le variabili d'ambiente dal file .env
     load_dotenv()
@@ -730,7 +1491,7 @@ def eventi_m3u8_generator_world():
     MFP_IP = os.getenv("IPMFP", "").strip()  
     MFP_PASSWORD = os.getenv("PASSMFP", "").strip()  
     OUTPUT_FILE = "eventi.m3u8" 
-    LINK_DADDY = os.getenv("LINK_DADDY", "https://daddylive.dad").strip()
+    LINK_DADDY = get_link_daddy()
 
         # Funzione per pulire il nome della categoria
     def clean_category_name(name): 
@@ -766,17 +1527,25 @@ def eventi_m3u8_generator_world():
                 team1 = teams[0].strip()
                 team2 = teams[1].strip()
                 
+                # Una ricerca di squadra non riuscita non blocca l'altra, ma rende il risultato provvisorio
+                errore_squadre = None
                 print(f"[🔍] Ricerca logo per Team 1: {team1}")
-                logo1_url = search_team_logo(team1)
+                try:
+                    logo1_url = search_team_logo(team1)
+                except RicercaLogoNonRiuscita as e:
+                    logo1_url, errore_squadre = None, e
                 
                 print(f"[🔍] Ricerca logo per Team 2: {team2}")
-                logo2_url = search_team_logo(team2)
+                try:
+                    logo2_url = search_team_logo(team2)
+                except RicercaLogoNonRiuscita as e:
+                    logo2_url, errore_squadre = None, e
                 
                 # Se abbiamo trovato entrambi i loghi, creiamo un'immagine combinata
                 if logo1_url and logo2_url:
                     # Scarica i loghi e l'immagine VS
                     try:
-                        from os.path import exists, getmtime
+                        from os.path import exists
                         
                         # Crea la cartella logos se non esiste
                         logos_dir = "logos"
@@ -784,9 +1553,10 @@ def eventi_m3u8_generator_world():
                         
                         # Verifica se l'immagine combinata esiste già e non è obsoleta
                         output_filename = f"logos/{team1}_vs_{team2}.png"
-                        if exists(output_filename):
-                            file_age = current_time - os.path.getmtime(output_filename)
-                            if file_age <= three_hours_in_seconds:
+                        # (i loghi obsoleti sono già stati rimossi da pulisci_loghi_obsoleti prima della ricerca)
+                        file_age = eta_file_logo(output_filename)
+                        if file_age is not None:
+                            if file_age <= LOGHI_DURATA_SECONDI:
                                 print(f"[✓] Utilizzo immagine combinata esistente: {output_filename}")
                                 
                                 # Carica le variabili d'ambiente per GitHub
@@ -803,10 +1573,10 @@ def eventi_m3u8_generator_world():
                                     return output_filename
                         
                         # Scarica i loghi
-                        response1 = requests.get(logo1_url, timeout=10)
+                        response1 = http_get(logo1_url, timeout=10)
                         img1 = Image.open(io.BytesIO(response1.content))
                         
-                        response2 = requests.get(logo2_url, timeout=10)
+                        response2 = http_get(logo2_url, timeout=10)
                         img2 = Image.open(io.BytesIO(response2.content))
                         
                         # Carica l'immagine VS (assicurati che esista nella directory corrente)
@@ -881,10 +1651,15 @@ def eventi_m3u8_generator_world():
                         
                     except Exception as e:
                         print(f"[!] Errore nella creazione dell'immagine combinata: {e}")
-                        # Se fallisce, restituisci solo il primo logo trovato
-                        return logo1_url
+                        # Se fallisce, restituisci solo il primo logo trovato (senza salvarlo in cache)
+                        return LogoProvvisorio(logo1_url)
                 
                 # Se non abbiamo trovato entrambi i loghi, restituisci quello che abbiamo
+                if errore_squadre:
+                    # Risultato parziale dovuto a una ricerca non riuscita: usalo solo per questo run
+                    if logo1_url or logo2_url:
+                        return LogoProvvisorio(logo1_url or logo2_url)
+                    raise errore_squadre
                 return logo1_url or logo2_url
             if ':' in event_name:
                 # Usa la parte prima dei ":" per la ricerca
@@ -905,7 +1680,7 @@ def eventi_m3u8_generator_world():
                     "Connection": "keep-alive"
                 } 
                 
-                response = requests.get(search_url, headers=headers, timeout=10)
+                response = http_get(search_url, headers=headers, timeout=10)
                 
                 if response.status_code == 200: 
                     # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -928,6 +1703,8 @@ def eventi_m3u8_generator_world():
                             # Se non troviamo PNG o SVG, prendi il primo risultato
                             print(f"[✓] Logo trovato con prefisso: {matches[0]}")
                             return matches[0]
+                else:
+                    raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
             
             # Se non riusciamo a identificare le squadre e il prefisso non ha dato risultati, procedi con la ricerca normale
             print(f"[🔍] Ricerca standard per: {clean_event_name}")
@@ -948,7 +1725,7 @@ def eventi_m3u8_generator_world():
                 "Connection": "keep-alive"
             } 
             
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = http_get(search_url, headers=headers, timeout=10)
             
             if response.status_code == 200: 
                 # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -994,9 +1771,14 @@ def eventi_m3u8_generator_world():
                 any_img = re.search(r'(https?://[^"\']+\.(?:png|jpg|jpeg|svg|webp))', response.text)
                 if any_img:
                     return any_img.group(1)
+            else:
+                raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
                     
+        except RicercaLogoNonRiuscita:
+            raise
         except Exception as e: 
             print(f"[!] Errore nella ricerca del logo per '{event_name}': {e}") 
+            raise RicercaLogoNonRiuscita(str(e)) from e
         
         # Se non troviamo nulla, restituiamo None 
         return None
@@ -1020,7 +1802,7 @@ def eventi_m3u8_generator_world():
                 "Connection": "keep-alive"
             } 
             
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = http_get(search_url, headers=headers, timeout=10)
             
             if response.status_code == 200: 
                 # Metodo 1: Cerca pattern per murl (URL dell'immagine media)
@@ -1066,85 +1848,84 @@ def eventi_m3u8_generator_world():
                 any_img = re.search(r'(https?://[^"\']+\.(?:png|jpg|jpeg|svg|webp))', response.text)
                 if any_img:
                     return any_img.group(1)
+            else:
+                raise RicercaLogoNonRiuscita(f"risposta HTTP {response.status_code} da Bing")
                     
+        except RicercaLogoNonRiuscita:
+            raise
         except Exception as e: 
             print(f"[!] Errore nella ricerca del logo per '{team_name}': {e}") 
+            raise RicercaLogoNonRiuscita(str(e)) from e
         
         # Se non troviamo nulla, restituiamo None 
         return None
      
-    def extract_channels_from_json(path): 
-        keywords = {"italy", "rai", "italia", "it", "uk", "tnt", "usa", "tennis channel", "tennis stream", "la"} 
-        now = datetime.now() 
+    # Usa la cache persistente per non ripetere su Bing le ricerche già fatte nei run precedenti
+    search_team_logo = con_cache_logo("squadra", search_team_logo)
+    search_logo_for_event = con_cache_logo("evento", search_logo_for_event)
+
+    def extract_channels_from_json(path):
+        keywords = PROFILI_LINGUA["world"]["keywords"]
+        now = datetime.now()
         yesterday = now.date() - timedelta(days=1)
-      
-        with open(path, "r", encoding="utf-8") as f: 
-            data = json.load(f) 
-      
-        categorized_channels = {} 
-      
-        for date_key, sections in data.items(): 
-            date_part = date_key.split(" - ")[0] 
-            try: 
-                date_obj = parser.parse(date_part, fuzzy=True).date() 
-            except Exception as e: 
-                print(f"[!] Errore parsing data '{date_part}': {e}") 
-                continue 
-      
-            # Includi sia la data odierna che quella di ieri
-            if date_obj != now.date() and date_obj != yesterday:
-                continue 
-      
-            date_str = date_obj.strftime("%Y-%m-%d") 
-      
-            for category_raw, event_items in sections.items(): 
-                category = clean_category_name(category_raw) 
-                if category not in categorized_channels: 
-                    categorized_channels[category] = [] 
-      
-                for item in event_items: 
-                    time_str = item.get("time", "00:00") 
-                    try: 
-                        # Prima verifica l'orario originale (senza aggiungere le 2 ore)
-                        original_time_obj = datetime.strptime(time_str, "%H:%M")
-                        
-                        # Se è il giorno precedente, includi solo gli eventi dalle 00:00 alle 04:00
-                        if date_obj == yesterday:
-                            if original_time_obj.hour < 0 or original_time_obj.hour >= 4:
-                                continue
-                        
-                        # Ora aggiungi le 2 ore per il display
-                        time_obj = original_time_obj + timedelta(hours=2)
-                        event_datetime = datetime.combine(date_obj, time_obj.time()) 
-      
-                        # Per il giorno corrente, mantieni la logica esistente
-                        if date_obj == now.date() and now - event_datetime > timedelta(hours=2): 
-                            continue 
-      
-                        time_formatted = time_obj.strftime("%H:%M") 
-                    except Exception: 
-                        time_formatted = time_str 
-      
-                    event_title = item.get("event", "Evento") 
-      
-                    for ch in item.get("channels", []): 
-                        channel_name = ch.get("channel_name", "") 
-                        channel_id = ch.get("channel_id", "") 
-      
-                        words = set(re.findall(r'\b\w+\b', channel_name.lower())) 
-                        if keywords.intersection(words): 
-                            tvg_name = f"{event_title} ({time_formatted})" 
-                            categorized_channels[category].append({ 
-                                "tvg_name": tvg_name, 
-                                "channel_name": channel_name, 
-                                "channel_id": channel_id, 
-                                "event_title": event_title  # Aggiungiamo il titolo dell'evento per la ricerca del logo 
-                            }) 
-      
+
+        date_selezionate = {now.date(), yesterday}
+
+        # Gruppi creati nell'ordine delle sezioni del palinsesto per le date selezionate (come nella lettura diretta del JSON)
+        categorized_channels = {}
+        for data_sezione, category_raw in indice_palinsesto(path)["sezioni"]:
+            if data_sezione in date_selezionate:
+                categorized_channels.setdefault(clean_category_name(category_raw), [])
+
+        # Interroga l'indice condiviso del palinsesto: solo eventi di oggi e di ieri con canali che corrispondono alle parole chiave
+        for evento, canali in eventi_per_parole(path, keywords, date=date_selezionate):
+            date_obj = evento["data"]
+
+            category = clean_category_name(evento["categoria"])
+            if category not in categorized_channels:
+                categorized_channels[category] = []
+
+            time_str = evento.get("time", "00:00")
+            if evento["inizio_utc"] is not None:
+                # Se è il giorno precedente, includi solo gli eventi dalle 00:00 alle 04:00 (orario originale)
+                if date_obj == yesterday and evento["inizio_utc"].hour >= 4:
+                    continue
+
+                # Ora aggiungi le 2 ore per il display
+                time_obj = evento["inizio_utc"] + timedelta(hours=2)
+                event_datetime = datetime.combine(date_obj, time_obj.time())
+
+                # Per il giorno corrente, mantieni la logica esistente
+                if date_obj == now.date() and now - event_datetime > timedelta(hours=2):
+                    continue
+
+                time_formatted = time_obj.strftime("%H:%M")
+            else:
+                time_formatted = time_str
+
+            event_title = evento.get("event", "Evento")
+
+            for ch in canali:
+                channel_name = ch.get("channel_name", "")
+                channel_id = ch.get("channel_id", "")
+
+                tvg_name = f"{event_title} ({time_formatted})"
+                categorized_channels[category].append({
+                    "tvg_name": tvg_name,
+                    "channel_name": channel_name,
+                    "channel_id": channel_id,
+                    "event_title": event_title  # Aggiungiamo il titolo dell'evento per la ricerca del logo
+                })
+
         return categorized_channels
       
     def generate_m3u_from_schedule(json_file, output_file): 
         categorized_channels = extract_channels_from_json(json_file) 
+
+        # Risolvi in parallelo i loghi di tutti gli eventi prima di scrivere la playlist
+        titoli_eventi = [re.sub(r'\s*\(\d{1,2}:\d{2}\)\s*$', '', ch["event_title"]) for channels in categorized_channels.values() for ch in channels]
+        loghi_eventi = risolvi_loghi_eventi(titoli_eventi, search_logo_for_event)
+        chiudi_cache_loghi()
       
         with open(output_file, "w", encoding="utf-8") as f: 
             f.write("#EXTM3U\n") 
@@ -1163,8 +1944,7 @@ def eventi_m3u8_generator_world():
                     # Cerca un logo per questo evento
                     # Rimuovi l'orario dal titolo dell'evento prima di cercare il logo
                     clean_event_title = re.sub(r'\s*\(\d{1,2}:\d{2}\)\s*$', '', event_title)
-                    print(f"[🔍] Ricerca logo per: {clean_event_title}") 
-                    logo_url = search_logo_for_event(clean_event_title) 
+                    logo_url = loghi_eventi.get(clean_event_title) 
                     logo_attribute = f' tvg-logo="{logo_url}"' if logo_url else '' 
       
                     stream_url = (f"{MFP_IP}/extractor/video?host=DLHD&d={LINK_DADDY}/embed/stream-{channel_id}.php" 
@@ -1181,6 +1961,7 @@ def eventi_m3u8_generator_world():
             exit(1) 
              
         generate_m3u_from_schedule(JSON_FILE, OUTPUT_FILE)
+        stampa_statistiche_cache_loghi()
     
 # Funzione per il quarto script (schedule_extractor.py)
 def schedule_extractor():
@@ -1199,9 +1980,78 @@ def schedule_extractor():
     # Carica le variabili d'ambiente dal file .env
     load_dotenv()
 
-    LINK_DADDY = os.getenv("LINK_DADDY", "https://daddylive.dad").strip()
+    LINK_DADDY = get_link_daddy()
     
     def html_to_json(html_content):
+        """
+        Converte il main-schedule-container in JSON con una sola scansione delle righe tramite lxml
+        (parser in C); se lxml non è disponibile o non trova righe di data usa BeautifulSoup
+        """
+        try:
+            from lxml import html as lxml_html
+            from lxml import etree
+        except ImportError:
+            return html_to_json_bs4(html_content)
+
+        def con_classe(tag, classe):
+            return etree.XPath(f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {classe} ')]")
+
+        trova_strong = etree.XPath(".//strong")
+        trova_time_div = con_classe("div", "event-time")
+        trova_info_div = con_classe("div", "event-info")
+        trova_link_canali = con_classe("a", "channel-button-small")
+
+        def testo(elemento):
+            return elemento.text_content().strip()
+
+        result = {}
+        current_date = None
+        current_category = None
+
+        for row in lxml_html.fromstring(html_content).iter('tr'):
+            classi = (row.get('class') or '').split()
+
+            if 'date-row' in classi:
+                current_date = testo(trova_strong(row)[0])
+                result[current_date] = {}
+                current_category = None
+
+            elif 'category-row' in classi and current_date:
+                current_category = testo(trova_strong(row)[0]) + "</span>"
+                result[current_date][current_category] = []
+
+            elif 'event-row' in classi and current_date and current_category:
+                time_div = trova_time_div(row)
+                info_div = trova_info_div(row)
+
+                if not time_div or not info_div:
+                    continue
+
+                time_strong = trova_strong(time_div[0])
+                event_data = {
+                    "time": testo(time_strong[0]) if time_strong else "",
+                    "event": testo(info_div[0]),
+                    "channels": []
+                }
+
+                # Cerca la riga dei canali successiva
+                next_row = next(row.itersiblings('tr'), None)
+                if next_row is not None and 'channel-row' in (next_row.get('class') or '').split():
+                    for link in trova_link_canali(next_row):
+                        channel_id_match = re.search(r'stream-(\d+)\.php', link.get('href', ''))
+                        if channel_id_match:
+                            event_data["channels"].append({
+                                "channel_name": re.sub(r'\s*\(CH-\d+\)$', '', testo(link)),
+                                "channel_id": channel_id_match.group(1)
+                            })
+
+                result[current_date][current_category].append(event_data)
+
+        if not result:
+            return html_to_json_bs4(html_content)
+        return result
+
+    def html_to_json_bs4(html_content):
         soup = BeautifulSoup(html_content, 'html.parser')
         result = {}
         
@@ -1261,71 +2111,261 @@ def schedule_extractor():
     
         return result
     
-    def modify_json_file(json_file_path):
-        with open(json_file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        current_month = datetime.now().strftime("%B")
-    
+    def chiave_data_con_mese(date):
+        """
+        "Sunday 18th 2026 - ..." -> "Sunday 18th <mese corrente> 2026"; le altre chiavi restano invariate
+        """
+        match = re.match(r"(\w+\s\d+)(st|nd|rd|th)\s(\d{4})", date)
+        if not match:
+            return date
+        day_part = match.group(1)
+        suffix = match.group(2)
+        year_part = match.group(3)
+        return f"{day_part}{suffix} {datetime.now().strftime('%B')} {year_part}"
+
+    def modify_json_data(data):
+        """
+        Sostituisce il mese nelle chiavi di data direttamente sul dizionario in memoria
+        """
         for date in list(data.keys()):
-            match = re.match(r"(\w+\s\d+)(st|nd|rd|th)\s(\d{4})", date)
-            if match:
-                day_part = match.group(1)
-                suffix = match.group(2)
-                year_part = match.group(3)
-                new_date = f"{day_part}{suffix} {current_month} {year_part}"
+            new_date = chiave_data_con_mese(date)
+            if new_date != date:
                 data[new_date] = data.pop(date)
     
+        return data
+
+    def salva_json_palinsesto(data, json_file_path):
+        # SCHEDULE_JSON_COMPATTO=si nel file .env scrive il JSON senza indentazione (più piccolo e veloce da leggere)
         with open(json_file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        
-        print(f"File JSON modificato e salvato in {json_file_path}")
-    
-    def extract_schedule_container():
-        url = f"{LINK_DADDY}/"
-    
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        json_output = os.path.join(script_dir, "daddyliveSchedule.json")
-    
-        print(f"Accesso alla pagina {url} per estrarre il main-schedule-container...")
+            if os.getenv("SCHEDULE_JSON_COMPATTO", "no").strip().lower() == "si":
+                json.dump(data, f, separators=(",", ":"))
+            else:
+                json.dump(data, f, indent=4)
     
+    def estrai_container_http(url):
+        """
+        Percorso veloce senza browser: scarica la pagina con una semplice GET e restituisce
+        l'HTML di main-schedule-container solo se contiene già le righe del palinsesto
+        """
+        try:
+            response = http_get(url)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"[!] Download HTTP della pagina non riuscito: {e}")
+            return ""
+
+        if 'date-row' not in response.text:
+            return ""
+
+        # Individua il container con lxml (parser in C); BeautifulSoup solo se lxml non è installato
+        try:
+            from lxml import html as lxml_html
+        except ImportError:
+            container = BeautifulSoup(response.text, 'html.parser').find(id='main-schedule-container')
+            return str(container) if container else ""
+
+        try:
+            container = lxml_html.fromstring(response.text).get_element_by_id('main-schedule-container')
+        except KeyError:
+            return ""
+        return lxml_html.tostring(container, encoding="unicode")
+
+    # Risorse non necessarie per leggere il palinsesto (PLAYWRIGHT_BLOCCA nel file .env, vuoto = nessun blocco)
+    ESTENSIONI_RISORSE = {
+        "image": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico"],
+        "font": ["*.woff", "*.woff2", "*.ttf", "*.otf"],
+        "media": ["*.mp4", "*.webm", "*.mp3", "*.m3u8", "*.ts"],
+        "stylesheet": ["*.css"],
+    }
+    HOST_PUBBLICITA = ["googlesyndication", "doubleclick", "google-analytics", "googletagmanager", "adservice", "popads", "propellerads"]
+
+    def blocca_risorse(context, page, persistente):
+        tipi = {t.strip().lower() for t in os.getenv("PLAYWRIGHT_BLOCCA", "image,media,font").split(",") if t.strip()}
+        if not tipi:
+            return
+
+        if persistente:
+            # Con il routing Playwright disattiva la cache HTTP: con il profilo persistente si blocca per URL via CDP
+            # così script e pagine continuano a essere serviti dalla cache su disco
+            cdp = context.new_cdp_session(page)
+            cdp.send("Network.enable")
+            cdp.send("Network.setBlockedURLs", {"urls": [e for t in tipi for e in ESTENSIONI_RISORSE.get(t, [])] + [f"*{h}*" for h in HOST_PUBBLICITA]})
+        else:
+            def gestisci_richiesta(route):
+                richiesta = route.request
+                if richiesta.resource_type in tipi or any(h in richiesta.url for h in HOST_PUBBLICITA):
+                    route.abort()
+                else:
+                    route.continue_()
+            context.route("**/*", gestisci_richiesta)
+
+    def normalizza_palinsesto_rete(data):
+        """
+        Accetta un JSON intercettato solo se ha la stessa forma di daddyliveSchedule.json
+        ({data: {categoria: [{time, event, channels}]}}); restituisce {} altrimenti
+        """
+        if not isinstance(data, dict) or not data:
+            return {}
+        result = {}
+        for date_key, categories in data.items():
+            # Le chiavi devono essere date del palinsesto, non campi qualsiasi di un'altra API
+            if not isinstance(categories, dict) or parse_data_palinsesto(chiave_data_con_mese(date_key)) is None:
+                return {}
+            result[date_key] = {}
+            for category, events in categories.items():
+                if not isinstance(events, list) or not all(isinstance(e, dict) and "time" in e and "event" in e for e in events):
+                    return {}
+                # Stesso formato delle categorie estratte dal DOM
+                category = category if category.endswith("</span>") else category + "</span>"
+                result[date_key][category] = [{
+                    "time": str(e["time"]).strip(),
+                    "event": str(e["event"]).strip(),
+                    "channels": [
+                        {"channel_name": str(ch.get("channel_name", "")).strip(), "channel_id": str(ch.get("channel_id", ""))}
+                        for ch in e.get("channels") or [] if isinstance(ch, dict) and ch.get("channel_id")
+                    ]
+                } for e in events]
+
+        # Almeno un evento con canali, altrimenti la risposta non è il palinsesto
+        if not any(e["channels"] for categories in result.values() for events in categories.values() for e in events):
+            return {}
+        return result
+
+    def palinsesto_da_risposta(testo):
+        """
+        Prova a ricavare il palinsesto dal corpo di una risposta XHR/fetch (JSON già strutturato
+        oppure frammento HTML con le righe date-row); {} se la risposta non contiene il palinsesto
+        """
+        try:
+            data = json.loads(testo)
+        except ValueError:
+            data = None
+
+        if data is not None:
+            palinsesto = normalizza_palinsesto_rete(data)
+            if palinsesto:
+                return palinsesto
+            # Alcune API restituiscono l'HTML del container dentro un campo JSON
+            if isinstance(data, dict):
+                testo = next((v for v in data.values() if isinstance(v, str) and 'date-row' in v), "")
+
+        if 'date-row' in testo:
+            return html_to_json(testo)
+        return {}
+
+    def estrai_container_playwright(url):
+        """
+        Restituisce (html del container, palinsesto intercettato dalla rete); il secondo è {} se nessuna
+        risposta XHR/fetch conteneva il palinsesto
+        """
+        user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36"
+        # Profilo Chromium persistente (PLAYWRIGHT_PROFILO nel file .env): mantiene la cache su disco tra un run e l'altro
+        profilo = os.getenv("PLAYWRIGHT_PROFILO", "").strip()
+        # Intercetta le risposte XHR/fetch della pagina (SCHEDULE_DA_RETE=no nel file .env per leggere solo il DOM)
+        da_rete = os.getenv("SCHEDULE_DA_RETE", "si").strip().lower() == "si"
+
         with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36"
-            )
-            page = context.new_page()
-    
+            if profilo:
+                profilo = os.path.join(os.path.dirname(os.path.abspath(__file__)), profilo)
+                browser = context = p.chromium.launch_persistent_context(profilo, headless=True, user_agent=user_agent)
+            else:
+                browser = p.chromium.launch(headless=True)
             try:
+                if not profilo:
+                    context = browser.new_context(user_agent=user_agent)
+                page = context.new_page()
+                blocca_risorse(context, page, bool(profilo))
+
+                # Le risposte vengono solo accodate nel gestore e lette nel ciclo di attesa
+                risposte = []
+                if da_rete:
+                    page.on("response", lambda r: risposte.append(r) if r.request.resource_type in ("xhr", "fetch") and r.ok else None)
+
+                # Attesa massima per il caricamento del palinsesto (SCHEDULE_ATTESA_MAX nel file .env, in secondi)
+                attesa_max_ms = int(get_env_numero("SCHEDULE_ATTESA_MAX", 30) * 1000)
+
                 print("Navigazione alla pagina...")
-                page.goto(url)
-                print("Attesa per il caricamento completo...")
-                page.wait_for_timeout(10000)  # 10 secondi
-    
-                schedule_content = page.evaluate("""() => {
+                page.goto(url, wait_until="domcontentloaded", timeout=attesa_max_ms)
+                print("Attesa per il caricamento del palinsesto...")
+                inizio_attesa = time.time()
+                scadenza = inizio_attesa + attesa_max_ms / 1000
+                dati_rete = {}
+                while True:
+                    # Prima le risposte di rete: se una contiene già il palinsesto non serve attendere il rendering
+                    while risposte and not dati_rete:
+                        risposta = risposte.pop(0)
+                        try:
+                            dati_rete = palinsesto_da_risposta(risposta.text())
+                        except Exception:
+                            continue
+                        if dati_rete:
+                            print(f"[✓] Palinsesto intercettato dalla risposta {risposta.url} in {time.time() - inizio_attesa:.1f}s")
+                    if dati_rete:
+                        return "", dati_rete
+
+                    # Prosegue appena il container contiene almeno una data e un evento
+                    if page.evaluate("""() => {
+                        const container = document.getElementById('main-schedule-container');
+                        return !!(container && container.querySelector('tr.date-row') && container.querySelector('tr.event-row'));
+                    }"""):
+                        print(f"[✓] Palinsesto caricato in {time.time() - inizio_attesa:.1f}s")
+                        break
+                    if time.time() >= scadenza:
+                        print(f"[!] Palinsesto non popolato entro {attesa_max_ms / 1000:.0f}s, provo comunque a leggere il container")
+                        break
+                    page.wait_for_timeout(200)
+
+                return page.evaluate("""() => {
                     const container = document.getElementById('main-schedule-container');
                     return container ? container.outerHTML : '';
-                }""")
-    
-                if not schedule_content:
-                    print("AVVISO: main-schedule-container non trovato o vuoto!")
-                    return False
-    
-                print("Conversione HTML in formato JSON...")
-                json_data = html_to_json(schedule_content)
-    
-                with open(json_output, "w", encoding="utf-8") as f:
-                    json.dump(json_data, f, indent=4)
+                }"""), {}
+            finally:
+                browser.close()
+
+    def extract_schedule_container():
+        url = f"{LINK_DADDY}/"
     
-                print(f"Dati JSON salvati in {json_output}")
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        json_output = os.path.join(script_dir, "daddyliveSchedule.json")
     
-                modify_json_file(json_output)
-                browser.close()
-                return True
+        print(f"Accesso alla pagina {url} per estrarre il main-schedule-container...")
+        inizio = time.time()
+
+        try:
+            json_data = {}
+            percorso = "HTTP"
+            # Prima prova senza browser (SCHEDULE_HTTP=no nel file .env per usare sempre Playwright)
+            if os.getenv("SCHEDULE_HTTP", "si").strip().lower() == "si":
+                schedule_content = estrai_container_http(url)
+                if schedule_content:
+                    print("Conversione HTML in formato JSON...")
+                    json_data = html_to_json(schedule_content)
+
+            # Ripiega su Playwright solo se la pagina statica non contiene righe di data
+            if not json_data:
+                print("[INFO] Palinsesto non presente nella pagina statica, uso Playwright...")
+                percorso = "Playwright"
+                schedule_content, json_data = estrai_container_playwright(url)
+
+                if json_data:
+                    percorso = "Playwright (risposta di rete)"
+                else:
+                    if not schedule_content:
+                        print("AVVISO: main-schedule-container non trovato o vuoto!")
+                        return False
+
+                    print("Conversione HTML in formato JSON...")
+                    json_data = html_to_json(schedule_content)
+    
+            # Rinomina le date in memoria e scrive il file una sola volta
+            salva_json_palinsesto(modify_json_data(json_data), json_output)
+            print(f"Dati JSON salvati in {json_output}")
+            print(f"[INFO] Palinsesto estratto tramite {percorso} in {time.time() - inizio:.1f}s")
+            return True
     
-            except Exception as e:
-                print(f"ERRORE: {str(e)}")
-                return False
+        except Exception as e:
+            print(f"ERRORE: {str(e)}")
+            return False
     
     if __name__ == "__main__":
         success = extract_schedule_container()
@@ -1339,7 +2379,6 @@ def epg_eventi_generator():
     # Il codice che avevi nello script "epg_eventi_generator.py" va qui, senza modifiche.
     import os
     import re
-    import json
     from datetime import datetime, timedelta
 
     # Funzione di utilità per pulire il testo (rimuovere tag HTML span)
@@ -1351,37 +2390,15 @@ def epg_eventi_generator():
         if not os.path.exists(json_file_path):
             print(f"[!] File JSON non trovato per EPG: {json_file_path}")
             return {}
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            json_data = json.load(file)
-        
+        # Interroga l'indice condiviso del palinsesto con le parole chiave dei canali da includere
+        keywords = PROFILI_LINGUA["it"]["keywords"]
         filtered_data = {}
-        for date, categories in json_data.items():
-            filtered_categories = {}
-            for category, events in categories.items():
-                filtered_events = []
-                for event_info in events:
-                    filtered_channels = []
-                    # Utilizza .get("channels", []) per gestire casi in cui "channels" potrebbe mancare
-                    for channel in event_info.get("channels", []): 
-                        channel_name = clean_text(channel.get("channel_name", "")) # Usa .get per sicurezza
-                        # Filtra per canali italiani
-                        if re.search(r'\b(italy|rai|italia|it)\b', channel_name, re.IGNORECASE):
-                            filtered_channels.append(channel)
-                    if filtered_channels:
-                        # Assicura che event_info sia un dizionario prima dello unpacking
-                        if isinstance(event_info, dict):
-                            filtered_events.append({**event_info, "channels": filtered_channels})
-                        else:
-                            # Logga un avviso se il formato dell'evento non è quello atteso
-                            print(f"[!] Formato evento non valido durante il filtraggio per EPG: {event_info}")
-                if filtered_events:
-                    filtered_categories[category] = filtered_events
-            if filtered_categories:
-                filtered_data[date] = filtered_categories
+        for evento, canali in eventi_per_parole(json_file_path, keywords):
+            filtered_data.setdefault(evento["data_key"], {}).setdefault(evento["categoria"], []).append({**evento, "channels": canali})
         return filtered_data
 
-    def generate_epg_xml(json_data):
-        epg_content = '<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n'
+    def generate_epg_xml(json_data, output_file):
+        xmltv_inizio(output_file)
         
         italian_offset = timedelta(hours=2)
         italian_offset_str = "+0200" 
@@ -1397,12 +2414,8 @@ def epg_eventi_generator():
             # Viene resettato per ogni nuova data.
             last_event_end_time_per_channel_on_date = {}
 
-            try:
-                date_str_from_key = date_key.split(' - ')[0]
-                date_str_cleaned = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_str_from_key)
-                event_date_part = datetime.strptime(date_str_cleaned, "%A %d %B %Y").date()
-            except ValueError as e:
-                print(f"[!] Errore nel parsing della data EPG: '{date_str_from_key}'. Errore: {e}")
+            event_date_part = parse_data_palinsesto(date_key)
+            if event_date_part is None:
                 continue
 
             if event_date_part < current_datetime_local.date():
@@ -1410,27 +2423,22 @@ def epg_eventi_generator():
 
             for category_name, events_list in categories.items():
                 # Ordina gli eventi per orario di inizio (UTC) per garantire la corretta logica "evento precedente"
-                try:
-                    sorted_events_list = sorted(
-                        events_list,
-                        key=lambda x: datetime.strptime(x.get("time", "00:00"), "%H:%M").time()
-                    )
-                except Exception as e_sort:
-                    print(f"[!] Attenzione: Impossibile ordinare gli eventi per la categoria '{category_name}' nella data '{date_key}'. Si procede senza ordinamento. Errore: {e_sort}")
-                    sorted_events_list = events_list
+                # (gli orari non validi finiscono in testa e vengono scartati nel ciclo)
+                sorted_events_list = sorted(
+                    events_list,
+                    key=lambda x: (x["inizio_utc"] is not None, x["inizio_utc"] or datetime.min)
+                )
 
                 for event_info in sorted_events_list:
                     time_str_utc = event_info.get("time", "00:00")
                     event_name = clean_text(event_info.get("event", "Evento Sconosciuto"))
                     event_desc = event_info.get("description", f"{event_name} trasmesso in diretta.")
 
-                    try:
-                        event_time_utc_obj = datetime.strptime(time_str_utc, "%H:%M").time()
-                        event_datetime_utc = datetime.combine(event_date_part, event_time_utc_obj)
-                        event_datetime_local = event_datetime_utc + italian_offset
-                    except ValueError as e:
-                        print(f"[!] Errore parsing orario UTC '{time_str_utc}' per EPG evento '{event_name}'. Errore: {e}")
+                    event_datetime_utc = event_info["inizio_utc"]
+                    if event_datetime_utc is None:
+                        print(f"[!] Errore parsing orario UTC '{time_str_utc}' per EPG evento '{event_name}'.")
                         continue
+                    event_datetime_local = event_datetime_utc + italian_offset
                     
                     if event_datetime_local < (current_datetime_local - timedelta(hours=2)):
                         continue
@@ -1443,9 +2451,7 @@ def epg_eventi_generator():
                             continue
 
                         if channel_id not in channel_ids_processed_for_channel_tag:
-                            epg_content += f'  <channel id="{channel_id}">\n'
-                            epg_content += f'    <display-name>{channel_name_cleaned}</display-name>\n'
-                            epg_content += f'  </channel>\n'
+                            xmltv_canale(output_file, channel_id, channel_name_cleaned)
                             channel_ids_processed_for_channel_tag.add(channel_id)
                         
                         # --- LOGICA ANNUNCIO MODIFICATA ---
@@ -1472,11 +2478,12 @@ def epg_eventi_generator():
                         if announcement_start_local < announcement_stop_local:
                             announcement_title = f'Inizierà alle {event_datetime_local.strftime("%H:%M")}.' # Orario italiano
                             
-                            epg_content += f'  <programme start="{announcement_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" stop="{announcement_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" channel="{channel_id}">\n'
-                            epg_content += f'    <title lang="it">{announcement_title}</title>\n'
-                            epg_content += f'    <desc lang="it">{event_name}.</desc>\n' 
-                            epg_content += f'    <category lang="it">Annuncio</category>\n'
-                            epg_content += f'  </programme>\n'
+                            xmltv_programma(
+                                output_file,
+                                f'{announcement_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                                f'{announcement_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                                channel_id, announcement_title, f"{event_name}.", "Annuncio"
+                            )
                         elif announcement_start_local == announcement_stop_local:
                             print(f"[INFO] Annuncio di durata zero saltato per l'evento '{event_name}' sul canale '{channel_id}'.")
                         else: # announcement_start_local > announcement_stop_local
@@ -1486,17 +2493,17 @@ def epg_eventi_generator():
                         main_event_start_local = event_datetime_local
                         main_event_stop_local = event_datetime_local + timedelta(hours=2) # Durata fissa 2 ore
                         
-                        epg_content += f'  <programme start="{main_event_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" stop="{main_event_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" channel="{channel_id}">\n'
-                        epg_content += f'    <title lang="it">{event_name}</title>\n'
-                        epg_content += f'    <desc lang="it">{event_desc}</desc>\n'
-                        epg_content += f'    <category lang="it">{clean_text(category_name)}</category>\n'
-                        epg_content += f'  </programme>\n'
+                        xmltv_programma(
+                            output_file,
+                            f'{main_event_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                            f'{main_event_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                            channel_id, event_name, event_desc, clean_text(category_name)
+                        )
 
                         # Aggiorna l'orario di fine dell'ultimo evento per questo canale in questa data
                         last_event_end_time_per_channel_on_date[channel_id] = main_event_stop_local
         
-        epg_content += "</tv>\n"
-        return epg_content
+        xmltv_fine(output_file)
 
     def epg_eventi_xml_generator():
         print("Eseguendo la generazione di eventi.xml...")
@@ -1514,12 +2521,10 @@ def epg_eventi_generator():
             print(f"[!] Nessun dato JSON caricato o filtrato da {json_input_full_path}. Salto la generazione di {XML_OUTPUT_FILE_EPG}.")
             return # Esce dalla funzione se non ci sono dati
 
-        # Genera il contenuto XML dell'EPG
-        epg_content_xml = generate_epg_xml(json_data_for_epg)
-        
-        # Salva il contenuto XML nel file di output
-        with open(xml_output_full_path, "w", encoding="utf-8") as file:
-            file.write(epg_content_xml)
+        # Genera l'EPG scrivendo i record direttamente nel file di output
+        with open(xml_output_full_path + ".tmp", "w", encoding="utf-8") as file:
+            generate_epg_xml(json_data_for_epg, file)
+        os.replace(xml_output_full_path + ".tmp", xml_output_full_path)
         print(f"File EPG eventi.xml salvato in: {xml_output_full_path}")
 
     if __name__ == "__main__":
@@ -1532,7 +2537,6 @@ def epg_eventi_generator_world():
     # Il codice che avevi nello script "epg_eventi_generator.py" va qui, senza modifiche.
     import os
     import re
-    import json
     from datetime import datetime, timedelta
 
     # Funzione di utilità per pulire il testo (rimuovere tag HTML span)
@@ -1544,37 +2548,15 @@ def epg_eventi_generator_world():
         if not os.path.exists(json_file_path):
             print(f"[!] File JSON non trovato per EPG: {json_file_path}")
             return {}
-        with open(json_file_path, "r", encoding="utf-8") as file:
-            json_data = json.load(file)
-        
+        # Interroga l'indice condiviso del palinsesto con le parole chiave dei canali da includere
+        keywords = PROFILI_LINGUA["world"]["keywords"]
         filtered_data = {}
-        for date, categories in json_data.items():
-            filtered_categories = {}
-            for category, events in categories.items():
-                filtered_events = []
-                for event_info in events:
-                    filtered_channels = []
-                    # Utilizza .get("channels", []) per gestire casi in cui "channels" potrebbe mancare
-                    for channel in event_info.get("channels", []): 
-                        channel_name = clean_text(channel.get("channel_name", "")) # Usa .get per sicurezza
-                        # Filtra per canali italiani
-                        if re.search(r'\b(italy|rai|italia|it|uk|tnt|usa|tennis channel|tennis stream)\b', channel_name, re.IGNORECASE):
-                            filtered_channels.append(channel)
-                    if filtered_channels:
-                        # Assicura che event_info sia un dizionario prima dello unpacking
-                        if isinstance(event_info, dict):
-                            filtered_events.append({**event_info, "channels": filtered_channels})
-                        else:
-                            # Logga un avviso se il formato dell'evento non è quello atteso
-                            print(f"[!] Formato evento non valido durante il filtraggio per EPG: {event_info}")
-                if filtered_events:
-                    filtered_categories[category] = filtered_events
-            if filtered_categories:
-                filtered_data[date] = filtered_categories
+        for evento, canali in eventi_per_parole(json_file_path, keywords):
+            filtered_data.setdefault(evento["data_key"], {}).setdefault(evento["categoria"], []).append({**evento, "channels": canali})
         return filtered_data
 
-    def generate_epg_xml(json_data):
-        epg_content = '<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n'
+    def generate_epg_xml(json_data, output_file):
+        xmltv_inizio(output_file)
         
         italian_offset = timedelta(hours=2)
         italian_offset_str = "+0200" 
@@ -1590,12 +2572,8 @@ def epg_eventi_generator_world():
             # Viene resettato per ogni nuova data.
             last_event_end_time_per_channel_on_date = {}
 
-            try:
-                date_str_from_key = date_key.split(' - ')[0]
-                date_str_cleaned = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_str_from_key)
-                event_date_part = datetime.strptime(date_str_cleaned, "%A %d %B %Y").date()
-            except ValueError as e:
-                print(f"[!] Errore nel parsing della data EPG: '{date_str_from_key}'. Errore: {e}")
+            event_date_part = parse_data_palinsesto(date_key)
+            if event_date_part is None:
                 continue
 
             if event_date_part < current_datetime_local.date():
@@ -1603,27 +2581,22 @@ def epg_eventi_generator_world():
 
             for category_name, events_list in categories.items():
                 # Ordina gli eventi per orario di inizio (UTC) per garantire la corretta logica "evento precedente"
-                try:
-                    sorted_events_list = sorted(
-                        events_list,
-                        key=lambda x: datetime.strptime(x.get("time", "00:00"), "%H:%M").time()
-                    )
-                except Exception as e_sort:
-                    print(f"[!] Attenzione: Impossibile ordinare gli eventi per la categoria '{category_name}' nella data '{date_key}'. Si procede senza ordinamento. Errore: {e_sort}")
-                    sorted_events_list = events_list
+                # (gli orari non validi finiscono in testa e vengono scartati nel ciclo)
+                sorted_events_list = sorted(
+                    events_list,
+                    key=lambda x: (x["inizio_utc"] is not None, x["inizio_utc"] or datetime.min)
+                )
 
                 for event_info in sorted_events_list:
                     time_str_utc = event_info.get("time", "00:00")
                     event_name = clean_text(event_info.get("event", "Evento Sconosciuto"))
                     event_desc = event_info.get("description", f"{event_name} trasmesso in diretta.")
 
-                    try:
-                        event_time_utc_obj = datetime.strptime(time_str_utc, "%H:%M").time()
-                        event_datetime_utc = datetime.combine(event_date_part, event_time_utc_obj)
-                        event_datetime_local = event_datetime_utc + italian_offset
-                    except ValueError as e:
-                        print(f"[!] Errore parsing orario UTC '{time_str_utc}' per EPG evento '{event_name}'. Errore: {e}")
+                    event_datetime_utc = event_info["inizio_utc"]
+                    if event_datetime_utc is None:
+                        print(f"[!] Errore parsing orario UTC '{time_str_utc}' per EPG evento '{event_name}'.")
                         continue
+                    event_datetime_local = event_datetime_utc + italian_offset
                     
                     if event_datetime_local < (current_datetime_local - timedelta(hours=2)):
                         continue
@@ -1636,9 +2609,7 @@ def epg_eventi_generator_world():
                             continue
 
                         if channel_id not in channel_ids_processed_for_channel_tag:
-                            epg_content += f'  <channel id="{channel_id}">\n'
-                            epg_content += f'    <display-name>{channel_name_cleaned}</display-name>\n'
-                            epg_content += f'  </channel>\n'
+                            xmltv_canale(output_file, channel_id, channel_name_cleaned)
                             channel_ids_processed_for_channel_tag.add(channel_id)
                         
                         # --- LOGICA ANNUNCIO MODIFICATA ---
@@ -1665,11 +2636,12 @@ def epg_eventi_generator_world():
                         if announcement_start_local < announcement_stop_local:
                             announcement_title = f'Inizierà alle {event_datetime_local.strftime("%H:%M")}.' # Orario italiano
                             
-                            epg_content += f'  <programme start="{announcement_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" stop="{announcement_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" channel="{channel_id}">\n'
-                            epg_content += f'    <title lang="it">{announcement_title}</title>\n'
-                            epg_content += f'    <desc lang="it">{event_name}.</desc>\n' 
-                            epg_content += f'    <category lang="it">Annuncio</category>\n'
-                            epg_content += f'  </programme>\n'
+                            xmltv_programma(
+                                output_file,
+                                f'{announcement_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                                f'{announcement_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                                channel_id, announcement_title, f"{event_name}.", "Annuncio"
+                            )
                         elif announcement_start_local == announcement_stop_local:
                             print(f"[INFO] Annuncio di durata zero saltato per l'evento '{event_name}' sul canale '{channel_id}'.")
                         else: # announcement_start_local > announcement_stop_local
@@ -1679,17 +2651,17 @@ def epg_eventi_generator_world():
                         main_event_start_local = event_datetime_local
                         main_event_stop_local = event_datetime_local + timedelta(hours=2) # Durata fissa 2 ore
                         
-                        epg_content += f'  <programme start="{main_event_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" stop="{main_event_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}" channel="{channel_id}">\n'
-                        epg_content += f'    <title lang="it">{event_name}</title>\n'
-                        epg_content += f'    <desc lang="it">{event_desc}</desc>\n'
-                        epg_content += f'    <category lang="it">{clean_text(category_name)}</category>\n'
-                        epg_content += f'  </programme>\n'
+                        xmltv_programma(
+                            output_file,
+                            f'{main_event_start_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                            f'{main_event_stop_local.strftime("%Y%m%d%H%M%S")} {italian_offset_str}',
+                            channel_id, event_name, event_desc, clean_text(category_name)
+                        )
 
                         # Aggiorna l'orario di fine dell'ultimo evento per questo canale in questa data
                         last_event_end_time_per_channel_on_date[channel_id] = main_event_stop_local
         
-        epg_content += "</tv>\n"
-        return epg_content
+        xmltv_fine(output_file)
 
     def epg_eventi_xml_generator():
         print("Eseguendo la generazione di eventi.xml...")
@@ -1707,12 +2679,10 @@ def epg_eventi_generator_world():
             print(f"[!] Nessun dato JSON caricato o filtrato da {json_input_full_path}. Salto la generazione di {XML_OUTPUT_FILE_EPG}.")
             return # Esce dalla funzione se non ci sono dati
 
-        # Genera il contenuto XML dell'EPG
-        epg_content_xml = generate_epg_xml(json_data_for_epg)
-        
-        # Salva il contenuto XML nel file di output
-        with open(xml_output_full_path, "w", encoding="utf-8") as file:
-            file.write(epg_content_xml)
+        # Genera l'EPG scrivendo i record direttamente nel file di output
+        with open(xml_output_full_path + ".tmp", "w", encoding="utf-8") as file:
+            generate_epg_xml(json_data_for_epg, file)
+        os.replace(xml_output_full_path + ".tmp", xml_output_full_path)
         print(f"File EPG eventi.xml salvato in: {xml_output_full_path}")
 
     if __name__ == "__main__":
@@ -1724,7 +2694,6 @@ def vavoo_italy_channels():
     # Aggiungi il codice del tuo script "vavoo_italy_channels.py" in questa funzione.
     print("Eseguendo il vavoo_italy_channels.py...")
     # Il codice che avevi nello script "vavoo_italy_channels.py" va qui, senza modifiche.
-    import requests
     import re
     import os
     import xml.etree.ElementTree as ET
@@ -1782,13 +2751,7 @@ def vavoo_italy_channels():
         return channel_id_map
     
     def fetch_channels(base_url):
-        try:
-            response = requests.get(f"{base_url}/channels", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Errore durante il download da {base_url}: {e}")
-            return []
+        return get_catalogo_canali(base_url)
     
     def clean_channel_name(name):
         name = re.sub(r"\s*(\|E|\|H|\(6\)|\(7\)|\.c|\.s)", "", name)
@@ -1873,7 +2836,6 @@ def world_channels_generator():
     # Aggiungi il codice del tuo script "world_channels_generator.py" in questa funzione.
     print("Eseguendo il world_channels_generator.py...")
     # Il codice che avevi nello script "world_channels_generator.py" va qui, senza modifiche.
-    import requests
     import re
     import os
     from collections import defaultdict
@@ -1891,13 +2853,7 @@ def world_channels_generator():
     
     # Scarica la lista dei canali
     def fetch_channels(base_url):
-        try:
-            response = requests.get(f"{base_url}/channels", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Errore durante il download da {base_url}: {e}")
-            return []
+        return get_catalogo_canali(base_url)
     
     # Pulisce il nome del canale
     def clean_channel_name(name):
@@ -2031,6 +2987,9 @@ def run_all_scripts():
     # Controllo variabile WORLD
     world_flag = os.getenv("WORLD", "si").strip().lower()
 
+    # Riduzione opzionale di epg.xml ai soli canali presenti nelle playlist
+    epg_solo_referenziati = os.getenv("EPG_SOLO_REFERENZIATI", "no").strip().lower()
+
     if world_flag == "si":
         try:
             world_channels_generator()
@@ -2044,6 +3003,13 @@ def run_all_scripts():
             print(f"Errore durante l'esecuzione di merger_playlistworld: {e}")
             return
 
+        if epg_solo_referenziati == "si":
+            try:
+                epg_pruner()
+            except Exception as e:
+                print(f"Errore durante l'esecuzione di epg_pruner: {e}")
+                return
+
         try:
             removerworld()
         except Exception as e:
@@ -2057,6 +3023,13 @@ def run_all_scripts():
             print(f"Errore durante l'esecuzione di merger_playlist: {e}")
             return
 
+        if epg_solo_referenziati == "si":
+            try:
+                epg_pruner()
+            except Exception as e:
+                print(f"Errore durante l'esecuzione di epg_pruner: {e}")
+                return
+
         try:
             remover()
         except Exception as e: